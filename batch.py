@@ -0,0 +1,202 @@
+import numpy as np
+from sudoku import Sudoku
+
+## Batch solver
+# Candidate elimination on many games at once
+# - Bitmask of valid values of every element in (N_game, N_element) array
+# - Naked and hidden singles are NumPy bitwise operations over all games
+# - Games stuck on singles get pointing, box-line reduction and
+#   naked/hidden pairs, also over all stuck games at once
+# - Games still open after elimination go to Sudoku one by one
+#
+
+def _bit_count_arr(mask_arr):
+    # Element-wise count of set bits
+    if hasattr(np, 'bitwise_count'): # NumPy 2.0+
+        return np.bitwise_count(mask_arr)
+    mask_arr = mask_arr - ((mask_arr >> 1) & 0x55555555)
+    mask_arr = (mask_arr & 0x33333333) + ((mask_arr >> 2) & 0x33333333)
+    mask_arr = (mask_arr + (mask_arr >> 4)) & 0x0F0F0F0F
+    return (mask_arr * 0x01010101 & 0xFFFFFFFF) >> 24
+
+_unit_index_cache = {}
+
+def _unit_index(N_block):
+    ## Index arrays built once per block size
+    # - unit_index: (3*N_size, N_size) elements of each row, column and block
+    # - element_unit: (N_element, 3) row, column and block unit of each element
+    # - element_pos: (N_element, 3) position of each element in flat unit_index
+    if N_block in _unit_index_cache:
+        return _unit_index_cache[N_block]
+    N_size = N_block**2
+    N_element = N_size**2
+    n_element_arr = np.arange(N_element)
+    n_row_arr = n_element_arr//N_size
+    n_col_arr = n_element_arr%N_size
+    n_block_arr = (n_row_arr//N_block)*N_block + n_col_arr//N_block
+    unit_key = np.concatenate((n_row_arr, N_size + n_col_arr, 2*N_size + n_block_arr))
+    unit_index = np.argsort(unit_key,kind='stable').reshape(3*N_size,N_size) % N_element
+    element_unit = np.stack((n_row_arr, N_size + n_col_arr, 2*N_size + n_block_arr),axis=1)
+    element_pos = np.argsort(unit_index.flatten(),kind='stable').reshape(N_element,3)
+    _unit_index_cache[N_block] = (unit_index, element_unit, element_pos)
+    return _unit_index_cache[N_block]
+
+def _or_others(mask_arr,axis):
+    # OR of the other entries along axis, for each entry
+    mask_arr = np.moveaxis(mask_arr,axis,-1)
+    fwd_arr = np.bitwise_or.accumulate(mask_arr,axis=-1)
+    bwd_arr = np.bitwise_or.accumulate(mask_arr[...,::-1],axis=-1)[...,::-1]
+    out_arr = np.zeros_like(mask_arr)
+    out_arr[...,1:] = fwd_arr[...,:-1]
+    out_arr[...,:-1] |= bwd_arr[...,1:]
+    return np.moveaxis(out_arr,-1,axis)
+
+def _transpose_bit(unit_mask,N_size):
+    # Bit n_val of position n_pos to bit n_pos of position n_val, in each unit
+    out_mask = np.zeros_like(unit_mask)
+    for n_pos in range(N_size):
+        out_mask |= ((unit_mask[...,n_pos,None] >> np.arange(N_size)) & 1) << n_pos
+    return out_mask
+
+def init_mask_batch(init_arr,N_block=3):
+    ## Bitmask array (N_game, N_element) of input games
+    N_size = N_block**2
+    init_arr = np.asarray(init_arr,dtype=np.int64).reshape(-1,N_size**2)
+    N_full = (1 << N_size) - 1
+    mask_arr = np.where(init_arr > 0, 1 << np.maximum(init_arr-1,0), N_full)
+    return mask_arr.astype(np.int32 if N_size < 31 else np.int64)
+
+def _elim_single(cur_mask,N_block):
+    ## Naked and hidden singles on (N_cur, N_element) masks
+    # - Return new masks and invalid status of each game
+    N_size = N_block**2
+    unit_index, element_unit, _ = _unit_index(N_block)
+
+    # Naked single: remove fixed values from peers
+    is_single = (cur_mask & (cur_mask-1)) == 0
+    fixed_mask = np.where(is_single,cur_mask,0)
+    fixed_unit = fixed_mask[:,unit_index]
+    used_unit = np.bitwise_or.reduce(fixed_unit,axis=2) # (N_cur, 3*N_size)
+    is_invalid = np.any(_bit_count_arr(fixed_unit).sum(axis=2) != _bit_count_arr(used_unit),axis=1)
+    used_peer = np.bitwise_or.reduce(used_unit[:,element_unit],axis=2)
+    new_mask = np.where(is_single,cur_mask,cur_mask & ~used_peer)
+
+    # Hidden single: value with single position in a unit
+    # - Values seen once and twice or more are accumulated over positions
+    new_unit = new_mask[:,unit_index]
+    once_unit = np.zeros_like(new_unit[:,:,0])
+    twice_unit = np.zeros_like(once_unit)
+    for n_pos in range(N_size):
+        twice_unit |= once_unit & new_unit[:,:,n_pos]
+        once_unit |= new_unit[:,:,n_pos]
+    is_invalid |= np.any(once_unit != (1 << N_size) - 1,axis=1) # Value without position
+    only_peer = np.bitwise_or.reduce((once_unit & ~twice_unit)[:,element_unit],axis=2)
+    hidden_mask = new_mask & only_peer
+    is_invalid |= np.any((hidden_mask & (hidden_mask-1)) != 0,axis=1) # Two values forced
+    new_mask = np.where(hidden_mask != 0,hidden_mask,new_mask)
+    return new_mask, is_invalid
+
+def _elim_pointing(mask_mat,N_block):
+    ## Pointing and box-line reduction along rows of (N_cur, N_size, N_size) masks
+    # - Pointing: values of a block only on one row are removed from the rest of the row
+    # - Box-line: values of a row only in one block are removed from the rest of the block
+    N_size = N_block**2
+    N_cur = np.shape(mask_mat)[0]
+    seg_mask = np.bitwise_or.reduce(mask_mat.reshape(N_cur,N_block,N_block,N_block,N_block),axis=4)
+    point_mask = seg_mask & ~_or_others(seg_mask,2) # Axis 2: rows of band
+    line_mask = seg_mask & ~_or_others(seg_mask,3) # Axis 3: blocks of band
+    elim_mask = _or_others(point_mask,3) | _or_others(line_mask,2)
+    return (mask_mat.reshape(N_cur,N_block,N_block,N_block,N_block) &
+            ~elim_mask[...,None]).reshape(N_cur,N_size,N_size)
+
+def _elim_pair(unit_mask):
+    ## Eliminations of naked pairs in (N_cur, N_unit, N_size) unit masks
+    # - Two positions with the same two values take them from rest of unit
+    # - Return eliminated values of each position and invalid status of each game
+    rem_mask = unit_mask & (unit_mask-1)
+    is_pair = (rem_mask != 0) & ((rem_mask & (rem_mask-1)) == 0)
+    N_match = ((unit_mask[...,:,None] == unit_mask[...,None,:]) & is_pair[...,:,None]).sum(axis=3)
+    is_invalid = np.any(N_match > 2,axis=(1,2)) # Three positions for two values
+    pair_mask = np.where(N_match == 2,unit_mask,0)
+    pair_unit = np.bitwise_or.reduce(pair_mask,axis=2)
+    return unit_mask & pair_unit[...,None] & ~pair_mask, is_invalid
+
+def _elim_subset(cur_mask,N_block):
+    ## Pointing, box-line reduction and naked/hidden pairs on (N_cur, N_element) masks
+    # - Hidden pairs are naked pairs of positions of each value
+    # - Return new masks and invalid status of each game
+    N_size = N_block**2
+    N_cur = np.shape(cur_mask)[0]
+    unit_index, _, element_pos = _unit_index(N_block)
+    mask_mat = _elim_pointing(cur_mask.reshape(N_cur,N_size,N_size),N_block)
+    mask_mat = _elim_pointing(mask_mat.transpose(0,2,1),N_block).transpose(0,2,1)
+    new_mask = mask_mat.reshape(N_cur,-1)
+
+    unit_mask = new_mask[:,unit_index]
+    elim_naked, is_invalid = _elim_pair(unit_mask)
+    elim_pos, is_invalid_pos = _elim_pair(_transpose_bit(unit_mask,N_size))
+    elim_unit = (elim_naked | _transpose_bit(elim_pos,N_size)).reshape(N_cur,-1)
+    elim_mask = np.bitwise_or.reduce(elim_unit[:,element_pos],axis=2)
+    return new_mask & ~elim_mask, is_invalid | is_invalid_pos
+
+def propagate_batch(mask_arr,N_block=3):
+    ## Candidate elimination on all games until nothing changes
+    # - Singles on every open game, subset rules only on games singles left unchanged
+    # - mask_arr is updated in place
+    # - Return validity of each game
+    N_game = np.shape(mask_arr)[0]
+    is_valid = np.ones(N_game,dtype=bool)
+    is_active = np.ones(N_game,dtype=bool)
+    while np.any(is_active):
+        n_game_arr = np.nonzero(is_active)[0]
+        cur_mask = mask_arr[n_game_arr]
+        new_mask, is_invalid = _elim_single(cur_mask,N_block)
+        is_invalid |= np.any(new_mask == 0,axis=1)
+        is_changed = np.any(new_mask != cur_mask,axis=1)
+
+        # Subset rules on games stuck on singles and not solved
+        is_stuck = ~(is_changed | is_invalid) & np.any((new_mask & (new_mask-1)) != 0,axis=1)
+        if np.any(is_stuck):
+            stuck_mask, is_invalid_stuck = _elim_subset(new_mask[is_stuck],N_block)
+            is_changed[is_stuck] = np.any(stuck_mask != new_mask[is_stuck],axis=1)
+            is_invalid[is_stuck] = is_invalid_stuck | np.any(stuck_mask == 0,axis=1)
+            new_mask[is_stuck] = stuck_mask
+
+        # Status
+        mask_arr[n_game_arr] = new_mask
+        is_valid[n_game_arr[is_invalid]] = False
+        is_active[n_game_arr] = is_changed & ~is_invalid
+    return is_valid
+
+def solve_batch(init_arr,N_block=3,n_guess_layer_list=range(0,12,4),n_trial_max=500):
+    ## Solve (N_game, N_size, N_size) games
+    # - Vectorized propagation first
+    # - Games left open are solved by Sudoku.solve with guess layer ladder
+    # - Return solution array and solved status of each game
+    N_size = N_block**2
+    init_arr = np.asarray(init_arr,dtype=np.int64).reshape(-1,N_size,N_size)
+    mask_arr = init_mask_batch(init_arr,N_block)
+    is_valid = propagate_batch(mask_arr,N_block)
+
+    # Determined values
+    is_single = (mask_arr & (mask_arr-1)) == 0
+    sol_vect = np.where(is_single & (mask_arr > 0),np.log2(np.maximum(mask_arr,1)).astype(np.int64)+1,0)
+    is_solved = is_valid & np.all(is_single,axis=1)
+
+    # Scalar solver for the rest
+    # - Determined values are given, reduced masks of open elements are
+    #   eliminated directly
+    for n_game in np.nonzero(is_valid & ~is_solved)[0]:
+        cur_game = Sudoku(np.reshape(sol_vect[n_game],(N_size,N_size)),N_block)
+        for n_element in np.nonzero(~is_single[n_game])[0].tolist():
+            cur_game._eliminate(n_element,~int(mask_arr[n_game,n_element]))
+        for n_guess_layer_max in n_guess_layer_list:
+            cur_game.N_trial = 0 # Reset trial count
+            cur_game.solve(n_guess_layer_max,n_trial_max,is_quiet=True)
+            if cur_game.is_solved == True:
+                break
+        if cur_game.is_solved:
+            sol_vect[n_game] = cur_game.cur_vect
+            is_solved[n_game] = True
+
+    return np.reshape(sol_vect,(-1,N_size,N_size)), is_solved
@@ -0,0 +1,219 @@
+import itertools
+import collections
+import numpy as np
+
+## Canonical form of games
+# Games equal under validity-preserving transforms share one canonical form
+# - Transforms: transpose, band (stack) order, row (column) order within band
+#   (stack) and value relabeling
+# - Values are relabeled in order of first appearance, row by row
+# - Rows and columns are ordered by invariants that no transform changes:
+#   clue count refined by clue counts of crossing lines
+# - Orders left open by tied invariants are all tried and the smallest
+#   relabeled game is kept, which makes the form exact
+# - Beyond N_order_max tied orders per orientation only the first ones are
+#   tried: the form is still a transform of the game, so two different games
+#   never share it, but equal games may not meet
+#
+# Solution cache
+# - Canonical game to canonical solution, least recently used in memory
+#   and optionally all of them in SQLite file
+# - Solution is transformed back to the caller's orientation on lookup
+#
+
+def _line_key(cur_mat,N_round=2):
+    ## Invariant keys of rows and columns
+    # - Start from clue count of each line
+    # - Refine by sorted keys of crossing lines at clues
+    is_clue = np.asarray(cur_mat) > 0
+    row_key = [(int(N_clue),) for N_clue in is_clue.sum(axis=1)]
+    col_key = [(int(N_clue),) for N_clue in is_clue.sum(axis=0)]
+    for n_round in range(N_round):
+        row_key, col_key = (
+            [(row_key[n_row],tuple(sorted(col_key[n_col] for n_col in np.flatnonzero(is_clue[n_row]))))
+             for n_row in range(len(row_key))],
+            [(col_key[n_col],tuple(sorted(row_key[n_row] for n_row in np.flatnonzero(is_clue[:,n_col]))))
+             for n_col in range(len(col_key))])
+    return row_key, col_key
+
+def _line_order_list(line_key,N_block):
+    ## All line orders consistent with invariant keys
+    # - Bands sorted by sorted keys of their lines, lines in band by key
+    # - Return list of choices per position group, product gives all orders
+    band_list = [list(range(n_band*N_block,(n_band+1)*N_block)) for n_band in range(N_block)]
+    band_key = [tuple(sorted(line_key[n_line] for n_line in band)) for band in band_list]
+
+    # Bands in key order, tied bands in any order
+    band_group_list = []
+    for _, group in itertools.groupby(sorted(range(N_block),key=band_key.__getitem__),key=band_key.__getitem__):
+        band_group_list.append(list(itertools.permutations(group)))
+
+    # Lines in band in key order, tied lines in any order
+    in_band_dict = {}
+    for n_band, band in enumerate(band_list):
+        group_list = []
+        for _, group in itertools.groupby(sorted(band,key=line_key.__getitem__),key=line_key.__getitem__):
+            group_list.append(list(itertools.permutations(group)))
+        in_band_dict[n_band] = [sum(choice,()) for choice in itertools.product(*group_list)]
+    return band_group_list, in_band_dict
+
+def _iter_line_order(band_group_list,in_band_dict):
+    # Lazy stream of full line orders
+    for band_choice in itertools.product(*band_group_list):
+        band_order = sum(band_choice,())
+        for in_band_choice in itertools.product(*(in_band_dict[n_band] for n_band in band_order)):
+            yield sum(in_band_choice,())
+
+def _relabel(cur_mat):
+    # Value map relabeling values in order of first appearance, 0 is kept
+    val_vect = cur_mat[cur_mat > 0]
+    _, n_first = np.unique(val_vect,return_index=True)
+    val_first = val_vect[np.sort(n_first)]
+    val_map = np.zeros(len(cur_mat)+1,dtype=np.int64)
+    val_map[val_first] = np.arange(1,len(val_first)+1)
+    return val_map
+
+def _full_map(val_map):
+    # Value map extended to values unused by the game, free values to free labels
+    # in increasing order, which is any valid choice as they are interchangeable
+    full_map = np.copy(val_map)
+    free_val = [val for val in range(1,len(val_map)) if val_map[val] == 0]
+    free_label = sorted(set(range(1,len(val_map))) - set(val_map[1:].tolist()))
+    full_map[free_val] = free_label
+    return full_map
+
+def canonical_form(cur_mat,N_block=3,N_order_max=4096):
+    ## Canonical form of game
+    # - Return (canon_mat, transform, is_exact)
+    # - transform is (is_transpose, row_order, col_order, val_map):
+    #   canon_mat = val_map[(cur_mat.T if is_transpose else cur_mat)[row_order][:,col_order]]
+    cur_mat = np.asarray(cur_mat)
+    best_byte = None
+    best_transform = None
+    is_exact = True
+    for is_transpose in (False,True):
+        base_mat = cur_mat.T if is_transpose else cur_mat
+        row_key, col_key = _line_key(base_mat)
+        row_order_list = _line_order_list(row_key,N_block)
+        col_order_list = _line_order_list(col_key,N_block)
+
+        # Row orders, then column orders of each, counted together against
+        # N_order_max so that neither stream is drawn in full
+        N_order = 0
+        is_cut = False
+        for row_order in _iter_line_order(*row_order_list):
+            row_mat = base_mat[list(row_order)]
+            for col_order in _iter_line_order(*col_order_list):
+                if N_order >= N_order_max:
+                    is_cut = True
+                    break
+                N_order += 1
+                perm_mat = row_mat[:,list(col_order)]
+                val_map = _relabel(perm_mat)
+                cand_byte = val_map[perm_mat].astype(np.uint8).tobytes()
+                if (best_byte is None) or (cand_byte < best_byte):
+                    best_byte = cand_byte
+                    best_transform = (is_transpose,row_order,col_order,val_map)
+            if is_cut:
+                is_exact = False
+                break
+    N_size = N_block**2
+    canon_mat = np.frombuffer(best_byte,dtype=np.uint8).reshape(N_size,N_size).astype(np.int64)
+    return canon_mat, best_transform, is_exact
+
+def apply_transform(cur_mat,transform):
+    # Game in canonical orientation of transform
+    is_transpose, row_order, col_order, val_map = transform
+    cur_mat = np.asarray(cur_mat)
+    if is_transpose:
+        cur_mat = cur_mat.T
+    return _full_map(val_map)[cur_mat[np.ix_(row_order,col_order)]]
+
+def invert_transform(canon_mat,transform):
+    # Game in original orientation from canonical orientation
+    is_transpose, row_order, col_order, val_map = transform
+    full_map = _full_map(val_map)
+    inv_map = np.zeros(len(full_map),dtype=np.int64)
+    inv_map[full_map] = np.arange(len(full_map))
+    cur_mat = np.zeros((len(row_order),len(col_order)),dtype=np.int64)
+    cur_mat[np.ix_(row_order,col_order)] = inv_map[np.asarray(canon_mat)]
+    if is_transpose:
+        cur_mat = cur_mat.T
+    return np.ascontiguousarray(cur_mat)
+
+class SolutionCache():
+    ## Canonical game to solution cache
+    # - Memory tier: OrderedDict of last N_entry_max games
+    # - Disk tier: SQLite file at db_path, None for memory only
+    def __init__(self,N_block=3,N_entry_max=1 << 14,db_path=None):
+        self.N_block = N_block
+        self.N_size = N_block**2
+        self.N_entry_max = N_entry_max
+        self.table = collections.OrderedDict()
+        self.db = None
+        if db_path is not None:
+            import sqlite3
+            self.db = sqlite3.connect(db_path)
+            self.db.execute("CREATE TABLE IF NOT EXISTS game (key BLOB PRIMARY KEY, sol BLOB)")
+        self.N_hit = 0
+        self.N_miss = 0
+
+    def commit(self):
+        # Write added games to disk tier, so other processes see them
+        if self.db is not None:
+            self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def _key(self,canon_mat):
+        return np.asarray(canon_mat,dtype=np.uint8).tobytes()
+
+    def _get(self,key):
+        # Canonical solution of key, None if not cached
+        if key in self.table:
+            self.table.move_to_end(key)
+            return self.table[key]
+        if self.db is not None:
+            row = self.db.execute("SELECT sol FROM game WHERE key = ?",(key,)).fetchone()
+            if row is not None:
+                canon_sol = np.frombuffer(row[0],dtype=np.uint8).reshape(self.N_size,self.N_size)
+                self._put_memory(key,canon_sol)
+                return canon_sol
+        return None
+
+    def _put_memory(self,key,canon_sol):
+        self.table[key] = canon_sol
+        self.table.move_to_end(key)
+        if len(self.table) > self.N_entry_max:
+            self.table.popitem(last=False)
+
+    def __contains__(self,init_mat):
+        # Game or an equal game is cached
+        canon_mat, _, _ = canonical_form(init_mat,self.N_block)
+        return self._get(self._key(canon_mat)) is not None
+
+    def lookup(self,init_mat):
+        ## Solution of game in its own orientation, None if not cached
+        canon_mat, transform, _ = canonical_form(init_mat,self.N_block)
+        canon_sol = self._get(self._key(canon_mat))
+        if canon_sol is None:
+            self.N_miss += 1
+            return None
+        self.N_hit += 1
+        return invert_transform(canon_sol,transform)
+
+    def add(self,init_mat,sol_mat):
+        ## Cache solution of game, return False if an equal game was cached
+        canon_mat, transform, _ = canonical_form(init_mat,self.N_block)
+        key = self._key(canon_mat)
+        if self._get(key) is not None:
+            return False
+        canon_sol = np.asarray(apply_transform(sol_mat,transform),dtype=np.uint8)
+        self._put_memory(key,canon_sol)
+        if self.db is not None:
+            self.db.execute("INSERT OR IGNORE INTO game VALUES (?, ?)",(key,canon_sol.tobytes()))
+        return True
@@ -0,0 +1,170 @@
+## Dancing Links (Algorithm X) exact cover solver
+# Knuth's DLX on circular doubly linked lists held in flat arrays
+# - Node 0 is root, node 1..N_col are column headers
+# - Each row is a list of nodes linked horizontally
+# - Cover/uncover unlinks and relinks columns in place
+#
+# Sudoku as exact cover (N_size = 9 for default)
+# - Row (n_element, val): candidate val at n_element
+# - Column: element is filled, val in row, val in column, val in block
+#
+
+class DLX():
+    ## Class to control exact cover matrix and search
+    def __init__(self,N_col):
+        # Header
+        self.N_col = N_col
+        N_header = N_col + 1
+        self.L = [n_node-1 for n_node in range(N_header)]
+        self.R = [n_node+1 for n_node in range(N_header)]
+        self.L[0] = N_col
+        self.R[N_col] = 0
+        self.U = list(range(N_header))
+        self.D = list(range(N_header))
+        self.C = list(range(N_header)) # Column header of each node
+        self.S = [0]*N_header # Column size
+        self.row_id = [-1]*N_header # Row id of each node
+
+        # Search status
+        self.N_node = 0 # Search node counter
+        self.N_layer = 0 # Current branching layer
+        self.N_layer_solved = 0 # Branching layer at first solution
+        self.is_aborted = False # Node limit reached
+        self.partial = [] # Row ids selected so far
+        self.solution_list = [] # Row ids of each solution
+
+    def add_row(self,row_id,col_list):
+        ## Append row covering col_list (0-based column index)
+        n_first = len(self.C)
+        for n_col in col_list:
+            n_header = n_col + 1
+            n_node = len(self.C)
+            self.C.append(n_header)
+            self.row_id.append(row_id)
+
+            # Vertical link at the bottom of column
+            self.U.append(self.U[n_header])
+            self.D.append(n_header)
+            self.D[self.U[n_header]] = n_node
+            self.U[n_header] = n_node
+            self.S[n_header] += 1
+
+            # Horizontal link at the end of row
+            if n_node == n_first:
+                self.L.append(n_node)
+                self.R.append(n_node)
+            else:
+                self.L.append(self.L[n_first])
+                self.R.append(n_first)
+                self.R[self.L[n_first]] = n_node
+                self.L[n_first] = n_node
+
+    def _cover(self,n_header):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        R[L[n_header]] = R[n_header]
+        L[R[n_header]] = L[n_header]
+        i = D[n_header]
+        while i != n_header:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def _uncover(self,n_header):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[n_header]
+        while i != n_header:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[n_header]] = n_header
+        L[R[n_header]] = n_header
+
+    def search(self,N_solution_max=1,n_node_max=None):
+        ## Search exact covers
+        # - Stop at N_solution_max solutions or n_node_max search nodes
+        # - Matrix is restored on return
+        self.solution_list = []
+        self.is_aborted = False
+        self._search(N_solution_max,n_node_max)
+        return self.solution_list
+
+    def _search(self,N_solution_max,n_node_max):
+        # Return True to stop the search
+        R, D, S = self.R, self.D, self.S
+        if R[0] == 0:
+            # All columns covered
+            if len(self.solution_list) == 0:
+                self.N_layer_solved = self.N_layer
+            self.solution_list.append(list(self.partial))
+            return len(self.solution_list) >= N_solution_max
+
+        # Node limit check
+        self.N_node += 1
+        if (n_node_max is not None) and (self.N_node > n_node_max):
+            self.is_aborted = True
+            return True
+
+        # Column with minimum size
+        n_header = R[0]
+        N_min = S[n_header]
+        j = R[n_header]
+        while j != 0 and N_min > 1:
+            if S[j] < N_min:
+                n_header = j
+                N_min = S[j]
+            j = R[j]
+        if N_min == 0:
+            return False
+        if N_min > 1:
+            self.N_layer += 1
+
+        # Try each row of the column
+        is_stop = False
+        self._cover(n_header)
+        r = D[n_header]
+        while r != n_header:
+            self.partial.append(self.row_id[r])
+            j = R[r]
+            while j != r:
+                self._cover(self.C[j])
+                j = R[j]
+            is_stop = self._search(N_solution_max,n_node_max)
+            j = self.L[r]
+            while j != r:
+                self._uncover(self.C[j])
+                j = self.L[j]
+            self.partial.pop()
+            if is_stop:
+                break
+            r = D[r]
+        self._uncover(n_header)
+        if N_min > 1:
+            self.N_layer -= 1
+        return is_stop
+
+def build_sudoku_cover(val_mask,N_block):
+    ## Exact cover matrix of Sudoku from bitmask of valid values
+    # - Row id is n_element*N_size + (val-1)
+    N_size = N_block**2
+    N_element = N_size**2
+    dlx = DLX(4*N_element)
+    for n_element in range(N_element):
+        n_row, n_col = divmod(n_element,N_size)
+        n_block = (n_row//N_block)*N_block + n_col//N_block
+        cur_mask = val_mask[n_element]
+        for n_val in range(N_size):
+            if cur_mask >> n_val & 1:
+                dlx.add_row(n_element*N_size + n_val,
+                            (n_element,
+                             N_element + n_row*N_size + n_val,
+                             2*N_element + n_col*N_size + n_val,
+                             3*N_element + n_block*N_size + n_val))
+    return dlx
@@ -0,0 +1,335 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+from sudoku import Sudoku, SearchMetrics, DeadStateTable
+from example import example
+from batch import solve_batch
+from store import line2mat
+
+## Objective and procedure
+# Benchmark of solving modes over graded corpus
+# - Grades I to V from example(), then files in corpus/ (one game per line)
+# - Each mode solves every game of each grade
+# - Report games/sec, p50/p99 latency, trial count and guess depth
+# - Results are written as JSON to compare between commits
+# - --check compares results of solve_deepening with and without dead_table,
+#   which must not change any result
+#
+# Last update: October 18, 2026
+#
+
+class Input():
+    # Input class
+    def __init__(self):
+        self.example_grade_dict = {'I': 1, 'II': 7, 'III': 13, 'IV': 19, 'V': 25}
+        self.corpus_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),"corpus")
+        self.n_guess_layer_list = range(0,12,4)
+        self.n_trial_max = 500
+        self.N_comb_guess = 2 # N_guess of solve_comb
+        self.N_worker = None # Processes of solve_parallel, None for all cores
+        self.parallel_solver = None # ParallelSolver, made on first use
+        self.portfolio_solver = None # PortfolioSolver, made on first use
+        self.tolerance = 0.10 # Allowed slowdown ratio in comparison
+
+        # Import time
+        self.import_module_list = ['sudoku','batch','store','main_gen','main_stream']
+        self.heavy_module_list = ['matplotlib','pytz','cProfile','snakeviz'] # Must not load on import
+        self.N_import_repeat = 5 # Fresh interpreters per module, median is kept
+        self.import_tolerance = 0.50 # Allowed import slowdown ratio, numpy load time is noisy
+
+## Corpus
+def load_corpus(INPUT):
+    ## Dictionary of grade to list of games
+    corpus_dict = {}
+    for grade, n_case in INPUT.example_grade_dict.items():
+        corpus_dict[grade] = [np.array(example(n_case))]
+    if os.path.isdir(INPUT.corpus_dir):
+        for file_name in sorted(os.listdir(INPUT.corpus_dir)):
+            if file_name.endswith('.txt'):
+                grade = file_name[:-4]
+                with open(os.path.join(INPUT.corpus_dir,file_name)) as file:
+                    corpus_dict[grade] = [game[0] for game in map(line2mat,file)
+                                          if game is not None]
+    return corpus_dict
+
+## Modes
+# Each mode solves a game and returns (is_solved, N_trial, N_layer)
+def mode_solve(init_mat,INPUT):
+    cur_game = Sudoku(init_mat)
+    N_trial = 0
+    for n_guess_layer_max in INPUT.n_guess_layer_list:
+        cur_game.N_trial = 0 # Reset trial count
+        cur_game.solve(n_guess_layer_max,INPUT.n_trial_max,is_quiet=True)
+        N_trial += cur_game.N_trial
+        if cur_game.is_solved == True:
+            break
+    return cur_game.is_solved, N_trial, cur_game.N_layer_solved
+
+def mode_solve_deepening(init_mat,INPUT):
+    cur_game = Sudoku(init_mat)
+    cur_game.solve_deepening(INPUT.n_guess_layer_list,INPUT.n_trial_max,is_quiet=True)
+    return cur_game.is_solved, cur_game.N_trial, cur_game.N_layer_solved
+
+def mode_solve_comb(init_mat,INPUT):
+    cur_game = Sudoku(init_mat)
+    cur_game.solve_comb(INPUT.N_comb_guess,INPUT.n_trial_max,is_quiet=True)
+    return cur_game.is_solved, cur_game.N_trial, None
+
+def mode_solve_dlx(init_mat,INPUT):
+    cur_game = Sudoku(init_mat)
+    cur_game.solve_dlx(is_quiet=True)
+    return cur_game.is_solved, cur_game.N_trial, cur_game.N_layer_solved
+
+def mode_count_solutions(init_mat,INPUT):
+    cur_game = Sudoku(init_mat)
+    cur_game.metrics = SearchMetrics()
+    N_solution = cur_game.count_solutions(1)
+    return N_solution == 1, cur_game.N_trial_count, cur_game.metrics.N_layer_max
+
+def mode_solve_parallel(init_mat,INPUT):
+    if INPUT.parallel_solver is None:
+        from parallel import ParallelSolver
+        INPUT.parallel_solver = ParallelSolver(INPUT.N_worker)
+    cur_game = Sudoku(init_mat)
+    INPUT.parallel_solver.solve(cur_game)
+    return cur_game.is_solved, cur_game.N_trial, None
+
+def mode_solve_portfolio(init_mat,INPUT):
+    if INPUT.portfolio_solver is None:
+        from parallel import PortfolioSolver
+        INPUT.portfolio_solver = PortfolioSolver()
+    cur_game = Sudoku(init_mat)
+    INPUT.portfolio_solver.solve(cur_game)
+    return cur_game.is_solved, cur_game.N_trial, None
+
+MODE_DICT = {'solve': mode_solve,
+             'solve_deepening': mode_solve_deepening,
+             'solve_comb': mode_solve_comb,
+             'solve_dlx': mode_solve_dlx,
+             'count_solutions': mode_count_solutions,
+             'solve_parallel': mode_solve_parallel,
+             'solve_portfolio': mode_solve_portfolio,
+             'batch': None} # Whole grade at once by solve_batch
+
+## Benchmark
+def run_mode(mode_name,init_list,INPUT,N_repeat=1):
+    ## Statistics of a mode over a list of games
+    init_list = init_list*N_repeat
+    N_game = len(init_list)
+    if mode_name == 'batch':
+        t_start = time.perf_counter()
+        _, is_solved = solve_batch(np.array(init_list),n_guess_layer_list=INPUT.n_guess_layer_list,
+                                   n_trial_max=INPUT.n_trial_max)
+        t_total = time.perf_counter() - t_start
+        return {'N_game': N_game,
+                'N_solved': int(np.sum(is_solved)),
+                'game_per_sec': N_game/t_total,
+                'p50_ms': None,
+                'p99_ms': None,
+                'trial_mean': None,
+                'trial_max': None,
+                'layer_max': None}
+
+    mode = MODE_DICT[mode_name]
+    t_list = []
+    trial_list = []
+    layer_list = []
+    N_solved = 0
+    for init_mat in init_list:
+        t_start = time.perf_counter()
+        is_solved, N_trial, N_layer = mode(init_mat,INPUT)
+        t_list.append(time.perf_counter() - t_start)
+        trial_list.append(N_trial)
+        if N_layer is not None:
+            layer_list.append(N_layer)
+        if is_solved:
+            N_solved += 1
+    return {'N_game': N_game,
+            'N_solved': N_solved,
+            'game_per_sec': N_game/sum(t_list),
+            'p50_ms': 1e3*float(np.percentile(t_list,50)),
+            'p99_ms': 1e3*float(np.percentile(t_list,99)),
+            'trial_mean': float(np.mean(trial_list)),
+            'trial_max': int(np.max(trial_list)),
+            'layer_max': int(np.max(layer_list)) if layer_list else None}
+
+## Check
+def check_dead_table(corpus_dict,INPUT):
+    ## Games where dead_table changes result of solve_deepening
+    # - Same solved status, validity and board expected
+    # - Return number of mismatched games
+    N_mismatch = 0
+    for grade, init_list in corpus_dict.items():
+        for n_game, init_mat in enumerate(init_list):
+            result_list = []
+            for dead_table in (None,DeadStateTable()):
+                cur_game = Sudoku(init_mat)
+                cur_game.dead_table = dead_table
+                cur_game.solve_deepening(INPUT.n_guess_layer_list,INPUT.n_trial_max,is_quiet=True)
+                result_list.append((cur_game.is_solved,cur_game.is_valid,cur_game.cur_mat.tolist()))
+            if result_list[0] != result_list[1]:
+                N_mismatch += 1
+                print("dead_table mismatch: grade " + grade + ", game " + str(n_game))
+    return N_mismatch
+
+def import_time(INPUT,N_repeat=1):
+    ## Import time of each module in fresh interpreters
+    # - Dictionary of module to median import time and heavy modules loaded
+    import subprocess
+    code = ("import sys, time, json; t = time.perf_counter(); import {}; "
+            "print(json.dumps([time.perf_counter() - t, [name for name in {!r} if name in sys.modules]]))")
+    import_result = {}
+    for module in INPUT.import_module_list:
+        t_list = []
+        for n_repeat in range(INPUT.N_import_repeat*N_repeat):
+            stdout = subprocess.run([sys.executable,'-c',code.format(module,INPUT.heavy_module_list)],
+                                    capture_output=True,text=True,check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            t_import, heavy_list = json.loads(stdout)
+            t_list.append(t_import)
+        import_result[module] = {'import_ms': 1e3*float(np.median(t_list)),
+                                 'heavy': heavy_list}
+    return import_result
+
+def git_commit():
+    # Current commit hash if available
+    try:
+        import subprocess
+        return subprocess.run(['git','rev-parse','--short','HEAD'],capture_output=True,text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+def compare_result(old_result,new_result,tolerance):
+    ## Print games/sec change of each mode and grade
+    # Return count of regressions slower than tolerance
+    N_regression = 0
+    print("\n{:>16} {:>16} {:>12} {:>12} {:>8}".format("Mode","Grade","Old [1/s]","New [1/s]","Change"))
+    for mode_name, grade_dict in new_result.items():
+        for grade, stat in grade_dict.items():
+            if grade not in old_result.get(mode_name,{}):
+                continue
+            old_rate = old_result[mode_name][grade]['game_per_sec']
+            new_rate = stat['game_per_sec']
+            change = new_rate/old_rate - 1
+            flag = ''
+            if change < -tolerance:
+                flag = ' <- regression'
+                N_regression += 1
+            print("{:>16} {:>16} {:>12.1f} {:>12.1f} {:>+7.1%}{}".format(mode_name,grade,old_rate,new_rate,change,flag))
+    return N_regression
+
+def compare_import(old_import,new_import,tolerance):
+    ## Print import time change of each module
+    # Return count of regressions slower than tolerance or loading heavy modules
+    N_regression = 0
+    print("\n{:>16} {:>12} {:>12} {:>8}".format("Module","Old [ms]","New [ms]","Change"))
+    for module, stat in new_import.items():
+        flag = ''
+        if stat['heavy']:
+            flag = ' <- loads ' + ', '.join(stat['heavy'])
+            N_regression += 1
+        if module not in old_import:
+            print("{:>16} {:>12} {:>12.1f} {:>8}{}".format(module,'-',stat['import_ms'],'-',flag))
+            continue
+        old_ms = old_import[module]['import_ms']
+        change = stat['import_ms']/old_ms - 1
+        if (change > tolerance) and not flag:
+            flag = ' <- regression'
+            N_regression += 1
+        print("{:>16} {:>12.1f} {:>12.1f} {:>+7.1%}{}".format(module,old_ms,stat['import_ms'],change,flag))
+    return N_regression
+
+def main_bench(mode_list,grade_list,N_repeat,out_path,compare_path,is_import_time=False,is_check=False):
+    ## Input class
+    INPUT = Input()
+    corpus_dict = load_corpus(INPUT)
+    if grade_list:
+        corpus_dict = {grade: corpus_dict[grade] for grade in grade_list}
+
+    ## Check
+    N_mismatch = 0
+    if is_check:
+        N_mismatch = check_dead_table(corpus_dict,INPUT)
+        print("dead_table check: " + str(N_mismatch) + " mismatched games\n")
+
+    ## Run
+    result = {}
+    if mode_list:
+        print("{:>16} {:>16} {:>8} {:>10} {:>10} {:>10} {:>10} {:>6}".format(
+            "Mode","Grade","Solved","Game/s","p50 [ms]","p99 [ms]","Trial","Layer"))
+    for mode_name in mode_list:
+        result[mode_name] = {}
+        for grade, init_list in corpus_dict.items():
+            stat = run_mode(mode_name,init_list,INPUT,N_repeat)
+            result[mode_name][grade] = stat
+            print("{:>16} {:>16} {:>8} {:>10.1f} {:>10} {:>10} {:>10} {:>6}".format(
+                mode_name,grade,
+                str(stat['N_solved']) + "/" + str(stat['N_game']),
+                stat['game_per_sec'],
+                '-' if stat['p50_ms'] is None else "{:.2f}".format(stat['p50_ms']),
+                '-' if stat['p99_ms'] is None else "{:.2f}".format(stat['p99_ms']),
+                '-' if stat['trial_mean'] is None else "{:.1f}".format(stat['trial_mean']),
+                '-' if stat['layer_max'] is None else str(stat['layer_max'])))
+
+    for solver in (INPUT.parallel_solver,INPUT.portfolio_solver):
+        if solver is not None:
+            solver.close()
+
+    ## Import time
+    import_result = None
+    if is_import_time:
+        import_result = import_time(INPUT,N_repeat)
+        print("\n{:>16} {:>12} {:>8}".format("Module","Import [ms]","Heavy"))
+        for module, stat in import_result.items():
+            print("{:>16} {:>12.1f} {:>8}".format(module,stat['import_ms'],','.join(stat['heavy']) or '-'))
+
+    ## Write
+    output = {'meta': {'commit': git_commit(),
+                       'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'N_repeat': N_repeat},
+              'result': result}
+    if import_result is not None:
+        output['import'] = import_result
+    if out_path:
+        with open(out_path,'w') as file:
+            json.dump(output,file,indent=1)
+
+    ## Compare
+    if compare_path:
+        with open(compare_path) as file:
+            old_output = json.load(file)
+        N_regression = 0
+        if result:
+            N_regression += compare_result(old_output['result'],result,INPUT.tolerance)
+        if import_result is not None:
+            N_regression += compare_import(old_output.get('import',{}),import_result,INPUT.import_tolerance)
+        return N_regression + N_mismatch
+    if import_result is not None:
+        return sum(1 for stat in import_result.values() if stat['heavy']) + N_mismatch
+    return N_mismatch
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sudoku solver benchmark")
+    parser.add_argument('--mode',action='append',choices=list(MODE_DICT),
+                        help="Solving mode, repeatable (default: all)")
+    parser.add_argument('--grade',action='append',help="Corpus grade, repeatable (default: all)")
+    parser.add_argument('--repeat',type=int,default=1,help="Repeat count of each grade")
+    parser.add_argument('--out',default='',help="JSON result path")
+    parser.add_argument('--compare',default='',help="JSON result path of previous run")
+    parser.add_argument('--import-time',action='store_true',
+                        help="Measure module import time, solving modes only if --mode is given")
+    parser.add_argument('--check',action='store_true',
+                        help="Check dead_table does not change results, solving modes only if --mode is given")
+    args = parser.parse_args()
+
+    mode_list = args.mode or ([] if (args.import_time or args.check) else list(MODE_DICT))
+    N_regression = main_bench(mode_list,args.grade,args.repeat,args.out,args.compare,
+                              args.import_time,args.check)
+    sys.exit(1 if N_regression > 0 else 0)
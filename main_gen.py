@@ -1,13 +1,11 @@
 import os
+import itertools
+import multiprocessing
 import numpy as np
-import matplotlib.pyplot as plt
 import time
-from sudoku import Sudoku
-from datetime import datetime
-from pytz import timezone
-import pytz
-import cProfile
-import subprocess
+from sudoku import Sudoku, rate_difficulty, gen_solved_grid, gen_solved_grid_search
+from store import GameStore, write_lines
+from canon import SolutionCache
 
 ## Objective and procedure
 # Sudoku game generator
@@ -17,102 +15,259 @@ import subprocess
 # Author: Jinwook Lee
 #
 
+OUT_EXT_DICT = {'store': '.sdb', 'line': '.txt', 'dat': '.dat'} # File extension of output format
+
 class Input():
     # Input class
     def __init__(self):
         self.N_game = 100
-        self.N_size = 9
+        self.N_block = 3 # 3x3 block, 4 or 5 for 16x16 or 25x25
+        self.N_size = self.N_block**2
         self.N_element = self.N_size**2
-        self.N_seed = 2 # Seed to generate random game
+        self.seed_mode = 'search' # Solved seed: 'search' (any game) or 'transform' (fastest)
         self.N_input_min = 20 # Count of provided numbers for problem
         self.N_input_max = 35 # Count of provided numbers for problem
         self.N_extract = 10 # Extract attempt limit
+        self.is_unique = True # Reject games with multiple solutions
+
+        # Game extraction
+        # - 'remove': remove clues from seed one at a time while unique
+        # - 'random': random clues between N_input_min and N_input_max
+        self.gen_mode = 'remove'
+        self.symmetry = 'rot180' # Clue removal pattern: none, rot180, rot90, mirror, diagonal
+        self.level_target = None # Difficulty level of rate_difficulty, None for any
         
-        self.n_guess_layer_list = range(0,6,2)
+        self.n_guess_layer_list = range(0,12,4)
         self.n_trial_max = 500
 
+        # Parallel generation
+        self.N_worker = 1 # Process count, 1 for serial
+        self.N_task_round = 4 # Tasks per worker submitted at once
+        self.is_ordered = True # Collect games in task order
+        self.seed = None # Base random seed, None for fresh entropy
+
+        # Output
+        # - 'store': binary GameStore (.sdb)
+        # - 'line': one game and solution per line (.txt)
+        # - 'dat': readable boards (.dat)
+        self.out_format = 'store'
+        self.N_flush = 100 # Games buffered per bulk write
+
+        # Duplicate games
+        # - Games equal to a collected one under transforms are skipped
+        # - cache_path keeps the index in SQLite file across runs, None for memory only
+        self.is_skip_duplicate = True
+        self.cache_path = None
+
 def main_gen(out_dir,PDT_int):
     ## Input class
     INPUT = Input()
 
-    ## Random game generator
+    ## Collect games from generator stream
+    # - Single writer regardless of worker count
+    # - Store and line outputs are written in bulk every N_flush games
     N_game = INPUT.N_game
+    file_path = out_dir + "/PDT_" + str(PDT_int) + OUT_EXT_DICT[INPUT.out_format]
+    game_store = GameStore(file_path,INPUT.N_block) if INPUT.out_format == 'store' else None
+    cache = SolutionCache(INPUT.N_block,db_path=INPUT.cache_path) if INPUT.is_skip_duplicate else None
+    buffer_list = []
+    n_game = 0
+    for N_input, init_mat, sol_mat, n_layer_solved, n_trial in gen_game_stream(INPUT):
+        if (cache is not None) and (cache.add(init_mat,sol_mat) == False):
+            print("\nSkipped duplicate game")
+            continue
+        n_game += 1
+        print("\nSolved game " + str(n_game))
+        Sudoku(sol_mat,INPUT.N_block).display()
+
+        # Write
+        if INPUT.out_format == 'dat':
+            write_result(n_game,
+                         N_input,
+                         init_mat,
+                         sol_mat,
+                         n_layer_solved,
+                         n_trial,
+                         file_path)
+        else:
+            buffer_list.append((init_mat,sol_mat,n_layer_solved,n_trial))
+        if len(buffer_list) >= INPUT.N_flush:
+            flush_result(INPUT,buffer_list,file_path,game_store)
+            buffer_list = []
+        if n_game >= N_game:
+            break
+    flush_result(INPUT,buffer_list,file_path,game_store)
+    if cache is not None:
+        cache.close()
+
+def gen_game_stream(INPUT):
+    ## Stream of generated games
+    # - Task n_task draws from its own RNG seeded by (seed, n_task),
+    #   so the games do not depend on which worker runs the task
+    # - Tasks are submitted in rounds of N_worker*N_task_round
+    # - Ordered stream yields games in task order, i.e. same games for same seed
+    seed = INPUT.seed
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    
+    # Serial
+    if INPUT.N_worker == 1:
+        for n_task in itertools.count():
+            game = _gen_game_task((INPUT,seed,n_task,False))
+            if game is not None:
+                yield game
+    
+    # Parallel
+    N_round = INPUT.N_worker*INPUT.N_task_round
+    with multiprocessing.Pool(INPUT.N_worker) as pool:
+        if INPUT.is_ordered:
+            pool_map = pool.imap
+        else:
+            pool_map = pool.imap_unordered
+        for n_round in itertools.count():
+            task_list = [(INPUT,seed,n_task,True)
+                         for n_task in range(n_round*N_round,(n_round+1)*N_round)]
+            for game in pool_map(_gen_game_task,task_list):
+                if game is not None:
+                    yield game
+
+def _gen_game_task(task):
+    # Pool task: one game with task own RNG
+    INPUT, seed, n_task, is_quiet = task
+    rng = np.random.default_rng([seed,n_task])
+    return gen_game(INPUT,rng,is_quiet)
+
+def gen_seed(INPUT,rng,is_quiet=False):
+    ## Random solved game as seed
+    if INPUT.seed_mode == 'transform':
+        seed_mat = gen_solved_grid(rng,INPUT.N_block)
+    else:
+        seed_mat = gen_solved_grid_search(rng,INPUT.N_block)
+    if is_quiet == False:
+        print("\n\nFound a valid seed")
+        Sudoku(seed_mat,INPUT.N_block).display()
+    return seed_mat
+
+def gen_game(INPUT,rng,is_quiet=False):
+    ## Random game extracted from a random seed
+    # - Return (N_input, init_mat, sol_mat, N_layer_solved, N_trial)
+    # - Return None if all extraction attempts fail
     N_size = INPUT.N_size
     N_element = INPUT.N_element
-    N_seed = INPUT.N_seed # Seed to generate random game
     N_input_min = INPUT.N_input_min
     N_input_max = INPUT.N_input_max
     N_extract = INPUT.N_extract
     n_guess_layer_list = INPUT.n_guess_layer_list
     n_trial_max = INPUT.n_trial_max
 
-    n_game = 0
-    while n_game < N_game:
-        ## Random seed
-        rand_array = []
-        for n_row in range(N_size):
-            cur_vect = np.arange(1,10)
-            np.random.shuffle(cur_vect)
-            rand_array.append(cur_vect.tolist())
-        rand_vect = np.array(rand_array).flatten()
-        i_select = np.random.choice(N_element,N_seed)
-        
-        zero_vect = np.zeros(N_size**2,dtype=int)
-        zero_vect[i_select] = rand_vect[i_select]
-        seed_mat = np.reshape(zero_vect,(N_size,N_size)).tolist()
-        seed_game = Sudoku(seed_mat)
-        seed_game.solve(N_size**2-N_seed,N_size**2,is_quiet=True)
-
-        # Sanity check
-        seed_game._scan()
-        if seed_game.is_solved == False:
-            continue
+    # Generate game
+    seed_vect = np.array(gen_seed(INPUT,rng,is_quiet)).flatten()
+    for n_extract in range(N_extract):
+        if INPUT.gen_mode == 'remove':
+            init_mat = remove_clues(INPUT,seed_vect,rng)
+            if init_mat is None:
+                if is_quiet == False:
+                    print("\nExtracting attempt " + str(n_extract+1) + " missed target level")
+                continue
+            N_input = int(np.count_nonzero(init_mat))
         else:
-            print("\n\nFound a valid seed")
-            seed_game.display()
-
-            # Generate game
-            seed_vect = np.array(seed_game.cur_mat).flatten()
-            for n_extract in range(N_extract):
-                print("\nExtracting attempt " + str(n_extract+1))
-                N_input = np.random.randint(N_input_min,N_input_max)
-                i_select = np.random.choice(N_element,N_input)
-                zero_vect = np.zeros(N_size**2,dtype=int)
-                zero_vect[i_select] = seed_vect[i_select]
-                init_mat = np.reshape(zero_vect,(N_size,N_size)).tolist()
-                cur_game = Sudoku(init_mat)
-                cur_game.display()
-
-                # Guess limit
-                for n_guess_layer_max in n_guess_layer_list:
-                    cur_game.N_trial = 0 # Reset trial count
-                    cur_game.solve(n_guess_layer_max,n_trial_max,is_quiet=True)
-                    if cur_game.is_solved == True:
-                        break
-
-                ## Display summary
-                if cur_game.is_solved:
-                    n_game += 1
-                    print("\nSolved game " + str(n_game))
-                    cur_game.display()
-
-                    # Write
-                    file_path = out_dir + "/PDT_" + str(PDT_int) + ".dat"
-                    write_result(n_game,
-                                N_input,
-                                init_mat,
-                                cur_game.cur_mat,
-                                cur_game.N_layer_solved,
-                                cur_game.N_trial,
-                                file_path)
-                    break
-                else:
-                    print("Failed to solve")
+            N_input = int(rng.integers(N_input_min,N_input_max))
+            i_select = rng.choice(N_element,N_input)
+            zero_vect = np.zeros(N_size**2,dtype=int)
+            zero_vect[i_select] = seed_vect[i_select]
+            init_mat = np.reshape(zero_vect,(N_size,N_size)).tolist()
+        cur_game = Sudoku(init_mat,INPUT.N_block)
+        if is_quiet == False:
+            print("\nExtracting attempt " + str(n_extract+1))
+            cur_game.display()
+
+        # Uniqueness (guaranteed by clue removal)
+        if (INPUT.gen_mode != 'remove') and INPUT.is_unique and (cur_game.count_solutions(2) != 1):
+            if is_quiet == False:
+                print("Multiple solutions")
+            continue
+
+        # Guess limit deepening
+        cur_game.solve_deepening(n_guess_layer_list,n_trial_max,is_quiet=True)
+
+        ## Summary
+        if cur_game.is_solved:
+            return (N_input,
+                    init_mat,
+                    cur_game.cur_mat,
+                    cur_game.N_layer_solved,
+                    cur_game.N_trial)
+        elif is_quiet == False:
+            print("Failed to solve")
+    return None
+
+def remove_clues(INPUT,seed_vect,rng):
+    ## Game by removing clues from solved seed one group at a time
+    # - Group is a set of elements symmetric under INPUT.symmetry
+    # - Removal is kept only if the game stays unique
+    #   and not harder than INPUT.level_target
+    # - Result is minimal (no remaining group can be removed) only if
+    #   level_target is None, otherwise groups are also kept when removing
+    #   them would raise the level
+    # - Return None if final level is not INPUT.level_target
+    N_size = INPUT.N_size
+    level_target = INPUT.level_target
+    cur_vect = np.array(seed_vect)
+    for group in _symmetry_group_list(N_size,INPUT.symmetry,rng):
+        cand_vect = np.copy(cur_vect)
+        cand_vect[list(group)] = 0
+        cand_mat = np.reshape(cand_vect,(N_size,N_size))
+        if Sudoku(cand_mat,INPUT.N_block).count_solutions(2) != 1:
+            continue
+        if (level_target is not None) and (rate_difficulty(cand_mat,INPUT.N_block) > level_target):
+            continue
+        cur_vect = cand_vect
+
+    # Target level
+    init_mat = np.reshape(cur_vect,(N_size,N_size)).tolist()
+    if (level_target is not None) and (rate_difficulty(init_mat,INPUT.N_block) != level_target):
+        return None
+    return init_mat
+
+def _symmetry_group_list(N_size,symmetry,rng):
+    ## Element groups closed under symmetry, in random order
+    group_set = set()
+    for n_row in range(N_size):
+        for n_col in range(N_size):
+            if symmetry == 'rot180':
+                pos_list = [(n_row,n_col),(N_size-1-n_row,N_size-1-n_col)]
+            elif symmetry == 'rot90':
+                pos_list = [(n_row,n_col),(n_col,N_size-1-n_row),
+                            (N_size-1-n_row,N_size-1-n_col),(N_size-1-n_col,n_row)]
+            elif symmetry == 'mirror':
+                pos_list = [(n_row,n_col),(n_row,N_size-1-n_col)]
+            elif symmetry == 'diagonal':
+                pos_list = [(n_row,n_col),(n_col,n_row)]
+            else:
+                pos_list = [(n_row,n_col)]
+            group_set.add(tuple(sorted(set(pos[0]*N_size + pos[1] for pos in pos_list))))
+    group_list = sorted(group_set)
+    return [group_list[n_group] for n_group in rng.permutation(len(group_list))]
+
+def flush_result(INPUT,buffer_list,file_path,game_store=None):
+    ## Bulk write of buffered games
+    if len(buffer_list) == 0:
+        return
+    init_arr = np.array([game[0] for game in buffer_list])
+    sol_arr = np.array([game[1] for game in buffer_list])
+    if INPUT.out_format == 'store':
+        game_store.append(init_arr,
+                          sol_arr,
+                          [game[2] for game in buffer_list],
+                          [game[3] for game in buffer_list])
+    else:
+        write_lines(file_path,init_arr,sol_arr)
 
 def write_result(n_game,N_input,input_mat,sol_mat,n_layer_solved,n_trial,file_path):
     ## Matrix size
-    N_size = int(np.sqrt(np.size(input_mat)))
-    N_block = int(np.sqrt(N_size))
+    N_size = int(round(np.sqrt(np.size(input_mat))))
+    N_block = int(round(np.sqrt(N_size)))
+    N_line = (len(str(N_size))+1)*N_size + 2*N_block - 2
 
     ## Open
     file = open(file_path,"a")
@@ -123,14 +278,11 @@ def write_result(n_game,N_input,input_mat,sol_mat,n_layer_solved,n_trial,file_pa
         cur_str = ''
     else:
         cur_str = '\n\n\n'
-    for n_col in range(2*N_size+2*N_block-2):
-        cur_str += '*'
+    cur_str += '*'*N_line
     file.write(cur_str)
     file.write("\n* Game: " + str(n_game))
     file.write("\n* Input count: " + str(N_input))
-    cur_str = '\n'
-    for n_col in range(2*N_size+2*N_block-2):
-        cur_str += '*'
+    cur_str = '\n' + '*'*N_line
     file.write(cur_str)
 
     # Input/Output
@@ -150,12 +302,11 @@ def write_result(n_game,N_input,input_mat,sol_mat,n_layer_solved,n_trial,file_pa
 def write_mat2file(file,cur_mat,N_size,N_block):
     # Conver to numpy array
     cur_mat = np.array(cur_mat)
+    N_width = len(str(N_size)) # Width of each value
+    N_line = (N_width+1)*N_size + 2*N_block - 2
 
     # Upper line
-    cur_str = '\n'
-    for n_col in range(2*N_size+2*N_block-2):
-        cur_str += '='
-    file.write(cur_str)
+    file.write('\n' + '='*N_line)
 
     # Main matrix
     for n_row in range(N_size):
@@ -163,28 +314,26 @@ def write_mat2file(file,cur_mat,N_size,N_block):
         for n_col in range(N_size):
             cur_val = cur_mat[n_row,n_col]
             if cur_val == 0:
-                cur_str += '  '
+                cur_str += ' '*(N_width+1)
             else:
-                cur_str += str(cur_val) + ' '
+                cur_str += str(cur_val).rjust(N_width) + ' '
             
             if (np.remainder(n_col+1,N_block) == 0) and (n_col+1 < N_size):
                 cur_str += '| '
         file.write(cur_str)
 
         if (np.remainder(n_row+1,N_block) == 0) and (n_row+1 < N_size):
-            cur_str = '\n'
-            for n_col in range(2*N_size+2*N_block-2):
-                cur_str += '-'
-            file.write(cur_str)
+            file.write('\n' + '-'*N_line)
 
     # Lower line
-    cur_str = '\n'
-    for n_col in range(2*N_size+2*N_block-2):
-        cur_str += '='
-    file.write(cur_str)
+    file.write('\n' + '='*N_line)
 
 if __name__ == '__main__':
     ## Current PDT time
+    # Time zone modules are loaded only here, not by workers importing this module
+    from datetime import datetime
+    from pytz import timezone
+    import pytz
     date_format='%Y%m%d_%H%M'
     date = datetime.now(tz=pytz.utc)
     date = date.astimezone(timezone('US/Pacific'))
@@ -0,0 +1,73 @@
+import numpy as np
+import time
+from sudoku import Sudoku, gen_solved_grid
+
+## Objective and procedure
+# Solve time versus board size
+# - Random solved game for each block size, part of clues removed at random
+# - Each engine solves the same games, mean time per game is reported
+#
+# Last update: October 18, 2026
+#
+
+class Input():
+    # Input class
+    def __init__(self):
+        self.N_block_list = [2,3,4,5] # 4x4 to 25x25
+        self.N_game = 5 # Games per block size
+        self.input_ratio = 0.5 # Ratio of clues kept
+        self.n_guess_layer_list = range(0,12,4)
+        self.n_trial_max = 500
+        self.seed = 0
+
+def solve_ladder(cur_game,INPUT):
+    # solve with guess layer ladder as main_single
+    for n_guess_layer_max in INPUT.n_guess_layer_list:
+        cur_game.N_trial = 0 # Reset trial count
+        cur_game.solve(n_guess_layer_max,INPUT.n_trial_max,is_quiet=True)
+        if cur_game.is_solved == True:
+            break
+    return cur_game.is_solved
+
+def solve_dlx(cur_game):
+    cur_game.solve_dlx(is_quiet=True)
+    return cur_game.is_solved
+
+def main_scale():
+    ## Input class
+    INPUT = Input()
+    rng = np.random.default_rng(INPUT.seed)
+    engine_dict = {'solve': lambda cur_game: solve_ladder(cur_game,INPUT),
+                   'solve_dlx': solve_dlx,
+                   'count_solutions': lambda cur_game: cur_game.count_solutions(1) == 1}
+
+    ## Header
+    print("{:>8} {:>16} {:>8} {:>12}".format("Size","Engine","Solved","Time [ms]"))
+    for N_block in INPUT.N_block_list:
+        N_size = N_block**2
+        N_element = N_size**2
+
+        # Games
+        init_list = []
+        for n_game in range(INPUT.N_game):
+            sol_vect = gen_solved_grid(rng,N_block).flatten()
+            i_select = rng.permutation(N_element)[:int(INPUT.input_ratio*N_element)]
+            zero_vect = np.zeros(N_element,dtype=int)
+            zero_vect[i_select] = sol_vect[i_select]
+            init_list.append(np.reshape(zero_vect,(N_size,N_size)))
+
+        # Each engine
+        for engine_name, engine in engine_dict.items():
+            N_solved = 0
+            t_start = time.perf_counter()
+            for init_mat in init_list:
+                if engine(Sudoku(init_mat,N_block)):
+                    N_solved += 1
+            t_end = time.perf_counter()
+            print("{:>8} {:>16} {:>8} {:>12.2f}".format(str(N_size) + "x" + str(N_size),
+                                                        engine_name,
+                                                        str(N_solved) + "/" + str(INPUT.N_game),
+                                                        1e3*(t_end-t_start)/INPUT.N_game))
+
+if __name__ == '__main__':
+    main_scale()
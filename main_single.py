@@ -1,19 +1,19 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import time
+import argparse
 from sudoku import Sudoku
 from example import example
-import cProfile
-import subprocess
 
 ## Objective and procedure
 # Solver for single Sudoku game
+# - Profiling with --profile, cProfile is imported only then
+# - Profile view with --snakeviz, requires optional snakeviz package
 #
 # Last update: August 27, 2023
 # Author: Jinwook Lee
 #
 
-def main(profileName):
+def main(profileName=None):
     ## Initialize
     init_array = example(25) # 1, 7, 13, 25
     init_mat = np.array(init_array)
@@ -24,23 +24,29 @@ def main(profileName):
 
     ## Start solver
     print("\nSolver started")
-    profiler = cProfile.Profile()
-    profiler.enable()
+    if profileName:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
 
-    # Guess limit
-    for n_guess_layer_max in range(0,6,2):
-        print("\n[Guess layer " + str(n_guess_layer_max) + "]")
-        n_trial_max = 500
-        
-        cur_game.N_trial = 0 # Reset trial count
-        cur_game.solve(n_guess_layer_max,n_trial_max)
-        #cur_game.solve_comb(n_guess_layer_max,n_trial_max)
-        if cur_game.is_solved == True:
-            break
+    # Guess limit deepening, each level resumes from boards left by the last
+    n_guess_layer_list = range(0,12,4)
+    n_trial_max = 500
+    cur_game.solve_deepening(n_guess_layer_list,n_trial_max)
+    #for n_guess_layer_max in n_guess_layer_list:
+    #    cur_game.N_trial = 0 # Reset trial count
+    #    cur_game.solve(n_guess_layer_max,n_trial_max)
+    #    #cur_game.solve_comb(n_guess_layer_max,n_trial_max)
+    #    if cur_game.is_solved == True:
+    #        break
+    #cur_game.solve_dlx(n_trial_max)
+    #solve_parallel(cur_game) # from parallel import solve_parallel
+    #solve_portfolio(cur_game) # from parallel import solve_portfolio
     
     ## Dump profiling
-    profiler.disable()
-    profiler.dump_stats(profileName)
+    if profileName:
+        profiler.disable()
+        profiler.dump_stats(profileName)
 
     ## Display summary
     if cur_game.is_solved:
@@ -50,9 +56,14 @@ def main(profileName):
         print("\nFailed to solve")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Single Sudoku game solver")
+    parser.add_argument('--profile',action='store_true',help="Dump cProfile stats to temp.prof")
+    parser.add_argument('--snakeviz',action='store_true',help="Profile and open in snakeviz")
+    args = parser.parse_args()
+
     ## Profiling main
     t_start = time.perf_counter()
-    profileName = 'temp.prof'
+    profileName = 'temp.prof' if (args.profile or args.snakeviz) else None
     main(profileName)
     
     ## Elapsed time
@@ -60,15 +71,16 @@ if __name__ == '__main__':
     print("Elapsed time: {:.3f} seconds".format(t_end-t_start))
 
     ## Profiling visualization
-    snakeVizCmd = "python -m snakeviz " + profileName
-    removeCmd_dos = "del " + profileName
-    removeCmd_linux = "rm " + profileName
-    p = subprocess.Popen(snakeVizCmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-    userInput = input("Enter to complete")
-    p = subprocess.Popen(removeCmd_dos, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-    p = subprocess.Popen(removeCmd_linux, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-
-    ## End
-    t_end = time.perf_counter()
-    print("Elapsed time: {:.3f} seconds".format(t_end-t_start))
+    if args.snakeviz:
+        import os
+        import subprocess
+        import sys
+        p = subprocess.Popen([sys.executable,"-m","snakeviz",profileName],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        userInput = input("Enter to complete")
+        p.terminate()
+        os.remove(profileName)
 
+        ## End
+        t_end = time.perf_counter()
+        print("Elapsed time: {:.3f} seconds".format(t_end-t_start))
@@ -0,0 +1,161 @@
+import sys
+import time
+import argparse
+import itertools
+import collections
+import concurrent.futures
+from sudoku import Sudoku, SearchMetrics
+from store import line2mat, mat2line
+
+## Objective and procedure
+# Streaming solver of game files
+# - Reads games from file or stdin, one per line (store line format)
+# - Writes "game solution" line to stdout as each game is solved,
+#   "game -" if not solved, "line error" if the line is not a game
+# - Games flow through generators in chunks of N_chunk lines
+# - At most N_window chunks are in flight, so memory does not grow with input
+# - Unordered output yields chunks as soon as any worker finishes
+#
+# Usage
+#   python main_stream.py games.txt --worker 4 > solved.txt
+#   cat games.txt | python main_stream.py --engine search --unordered
+#
+
+ENGINE_LIST = ('dlx','search','ladder')
+
+## Solve
+class _BudgetExceeded(Exception):
+    pass
+
+def _check_budget(N_node_max):
+    # SearchMetrics callback: abort search after N_node_max nodes
+    def check_budget(event,game):
+        if (event == 'node') and (game.N_trial > N_node_max):
+            raise _BudgetExceeded()
+    return check_budget
+
+def solve_game(init_mat,N_block=3,engine='dlx',N_node_max=None):
+    ## Solution of a game, None if not solved
+    # - N_node_max: search nodes at most, None for no limit
+    cur_game = Sudoku(init_mat,N_block)
+    if engine == 'dlx':
+        cur_game.solve_dlx(N_node_max,is_quiet=True)
+        return cur_game.cur_mat if cur_game.is_solved else None
+    if engine == 'search':
+        if N_node_max is not None:
+            cur_game.metrics = SearchMetrics(callback=_check_budget(N_node_max))
+        try:
+            cur_game.count_solutions(1)
+        except _BudgetExceeded:
+            return None
+        return cur_game.sol_mat
+
+    # Guess layer ladder, 500 trials per level as main_single,
+    # N_node_max over all levels
+    N_trial_total = 0
+    for n_guess_layer_max in range(0,12,4):
+        n_trial_max = 500
+        if N_node_max is not None:
+            n_trial_max = min(n_trial_max,N_node_max - N_trial_total)
+            if n_trial_max <= 0:
+                break
+        cur_game.N_trial = 0 # Reset trial count
+        cur_game.solve(n_guess_layer_max,n_trial_max,is_quiet=True)
+        N_trial_total += cur_game.N_trial
+        if cur_game.is_solved == True:
+            return cur_game.cur_mat
+    return None
+
+def solve_chunk(task):
+    # Worker task: output lines of a chunk of game lines
+    line_list, N_block, engine = task
+    out_list = []
+    for line in line_list:
+        try:
+            game = line2mat(line,N_block)
+        except ValueError:
+            out_list.append(line.split()[0] + ' error')
+            continue
+        if game is None:
+            continue
+        sol_mat = solve_game(game[0],N_block,engine)
+        out_list.append(mat2line(game[0]) + ' ' + ('-' if sol_mat is None else mat2line(sol_mat)))
+    return out_list
+
+## Pipeline
+def read_chunks(file,N_chunk):
+    # Stream of line chunks
+    while True:
+        line_list = list(itertools.islice(file,N_chunk))
+        if len(line_list) == 0:
+            return
+        yield line_list
+
+def solve_stream(file,N_block=3,engine='dlx',N_worker=1,N_chunk=16,N_window=None,is_ordered=True):
+    ## Stream of output lines
+    task_iter = ((line_list,N_block,engine) for line_list in read_chunks(file,N_chunk))
+
+    # Serial
+    if N_worker == 1:
+        for task in task_iter:
+            yield from solve_chunk(task)
+        return
+
+    # Parallel with bounded window of futures
+    if N_window is None:
+        N_window = 4*N_worker
+    with concurrent.futures.ProcessPoolExecutor(N_worker) as executor:
+        if is_ordered:
+            future_queue = collections.deque()
+            for task in task_iter:
+                future_queue.append(executor.submit(solve_chunk,task))
+                if len(future_queue) >= N_window:
+                    yield from future_queue.popleft().result()
+            while future_queue:
+                yield from future_queue.popleft().result()
+        else:
+            future_set = set()
+            for task in task_iter:
+                future_set.add(executor.submit(solve_chunk,task))
+                if len(future_set) >= N_window:
+                    done_set, future_set = concurrent.futures.wait(
+                        future_set,return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done_set:
+                        yield from future.result()
+            for future in concurrent.futures.as_completed(future_set):
+                yield from future.result()
+
+def main_stream(args):
+    ## Solve input stream and write to stdout
+    if args.path == '-':
+        file = sys.stdin
+    else:
+        file = open(args.path)
+    t_start = time.perf_counter()
+    N_game = 0
+    N_solved = 0
+    try:
+        for out_line in solve_stream(file,args.block,args.engine,args.worker,
+                                     args.chunk,args.window,not args.unordered):
+            sys.stdout.write(out_line + '\n')
+            sys.stdout.flush()
+            N_game += 1
+            N_solved += not (out_line.endswith(' -') or out_line.endswith(' error'))
+    finally:
+        if file is not sys.stdin:
+            file.close()
+    t_total = time.perf_counter() - t_start
+    print("Solved {}/{} games in {:.2f} sec".format(N_solved,N_game,t_total),file=sys.stderr)
+    return N_solved == N_game
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Streaming Sudoku solver, one game per line")
+    parser.add_argument('path',nargs='?',default='-',help="Game file, - for stdin")
+    parser.add_argument('--engine',choices=ENGINE_LIST,default='dlx')
+    parser.add_argument('--block',type=int,default=3,help="N_block, 4 or 5 for 16x16 or 25x25")
+    parser.add_argument('--worker',type=int,default=1,help="Process count, 1 for serial")
+    parser.add_argument('--chunk',type=int,default=16,help="Lines per task")
+    parser.add_argument('--window',type=int,default=None,help="Tasks in flight, 4 per worker by default")
+    parser.add_argument('--unordered',action='store_true',help="Write results as they complete")
+    args = parser.parse_args()
+    sys.exit(0 if main_stream(args) else 1)
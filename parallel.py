@@ -0,0 +1,294 @@
+import os
+import itertools
+import collections
+import multiprocessing
+import concurrent.futures
+import numpy as np
+from sudoku import Sudoku, SearchMetrics, RULE_LIST
+
+## Parallel subtree search
+# Search of a single game on many processes
+# - Top of the guess tree is expanded breadth first on the caller's process
+#   until there are N_task_worker open boards per worker
+# - Each board is a task of complete search (count_solutions) in a process pool
+# - Pool hands out tasks as workers get free, so a worker done with an easy
+#   subtree takes the next one instead of idling
+# - First solution sets a shared stop event, pending tasks are cancelled and
+#   running ones stop at their next check
+#
+# Portfolio search
+# Race of strategy configs on the whole game, see PORTFOLIO_LIST
+# - Configs differ in engine, inference rules and value order
+# - Random value order restarts on Luby schedule of search nodes,
+#   so an unlucky order does not run on
+# - First solution, or first proof of no solution, wins and stops the rest
+#
+# Usage
+#   with ParallelSolver(4) as solver:
+#       solver.solve(cur_game)
+#   with PortfolioSolver() as solver:
+#       solver.solve(cur_game)
+#
+
+# Strategy configs of portfolio
+# - engine: 'search' (count_solutions) or 'comb' (solve_comb of N_guess)
+# - rule_list: inference rules on, all others off
+# - seed: random value order if not None, least constraining value first if None
+# - N_restart_base: search nodes of first run, times Luby sequence on restart
+PORTFOLIO_LIST = [
+    {'name': 'lcv_full', 'engine': 'search', 'rule_list': RULE_LIST, 'seed': None},
+    {'name': 'lcv_singles', 'engine': 'search', 'rule_list': ('hidden_single',), 'seed': None},
+    {'name': 'rand_pointing', 'engine': 'search', 'rule_list': ('hidden_single','pointing'),
+     'seed': 1, 'N_restart_base': 32},
+    {'name': 'rand_full', 'engine': 'search', 'rule_list': RULE_LIST,
+     'seed': 2, 'N_restart_base': 16},
+    {'name': 'rand_none', 'engine': 'search', 'rule_list': (),
+     'seed': 3, 'N_restart_base': 128},
+    {'name': 'comb_full', 'engine': 'comb', 'rule_list': RULE_LIST, 'N_guess': 2},
+]
+
+_stop_event = None # Stop event of worker process
+
+class _SearchStopped(Exception):
+    pass
+
+class _RestartDue(Exception):
+    pass
+
+def _init_worker(stop_event):
+    # Pool initializer: keep stop event shared with caller
+    global _stop_event
+    _stop_event = stop_event
+
+def _check_stop(event,game):
+    # SearchMetrics callback: abort search once stop event is set
+    if (event == 'node') and (game.N_trial % 64 == 0) and _stop_event.is_set():
+        raise _SearchStopped()
+
+def _search_task(task):
+    ## Pool task: complete search of one subtree
+    # - Return (status, sol_mat, N_trial), status is 'solved', 'dead' or 'stopped'
+    sub_mat, N_block, rule_on = task
+    if _stop_event.is_set():
+        return 'stopped', None, 0
+    cur_game = Sudoku(sub_mat,N_block)
+    for rule_name, is_on in rule_on.items():
+        cur_game.set_rule(rule_name,is_on)
+    cur_game.metrics = SearchMetrics(callback=_check_stop)
+    try:
+        cur_game.count_solutions(1)
+    except _SearchStopped:
+        return 'stopped', None, cur_game.N_trial
+    if cur_game.sol_mat is None:
+        return 'dead', None, cur_game.N_trial_count
+    return 'solved', cur_game.sol_mat, cur_game.N_trial_count
+
+def _luby(n):
+    # n-th term of Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ...
+    k = 1
+    while (1 << k) - 1 < n:
+        k += 1
+    while (1 << k) - 1 != n:
+        n -= (1 << (k-1)) - 1
+        k = 1
+        while (1 << k) - 1 < n:
+            k += 1
+    return 1 << (k-1)
+
+def _portfolio_task(task):
+    ## Pool task: whole game with one strategy config
+    # - Return (status, sol_mat, N_trial) as _search_task
+    init_mat, N_block, config = task
+    if _stop_event.is_set():
+        return 'stopped', None, 0
+    cur_game = Sudoku(init_mat,N_block)
+    for rule_name in cur_game.rule_list:
+        cur_game.set_rule(rule_name,rule_name in config['rule_list'])
+    cur_game.metrics = SearchMetrics(callback=_check_stop)
+    try:
+        # Combinatoric survey, not complete beyond N_guess
+        if config['engine'] == 'comb':
+            cur_game.solve_comb(config['N_guess'],float('inf'),is_quiet=True)
+            if cur_game.is_solved == True:
+                return 'solved', cur_game.cur_mat, cur_game.N_trial
+            if cur_game.is_valid == False:
+                return 'dead', None, cur_game.N_trial
+            return 'stopped', None, cur_game.N_trial
+
+        # Search, restarted with new value order once node budget is used up
+        rng = None
+        if config['seed'] is not None:
+            rng = np.random.default_rng(config['seed'])
+        N_restart_base = config.get('N_restart_base')
+        cur_game._scan_till_end() # Restart point after initial queue is placed
+        if cur_game.is_valid == False:
+            return 'dead', None, cur_game.N_trial
+        if cur_game.is_solved == True:
+            return 'solved', np.copy(cur_game.cur_mat), cur_game.N_trial
+        n_trail = len(cur_game.trail)
+        for n_restart in itertools.count(1):
+            N_trial_end = None
+            if (rng is not None) and N_restart_base:
+                N_trial_end = cur_game.N_trial + N_restart_base*_luby(n_restart)
+            def check_budget(event,game):
+                _check_stop(event,game)
+                if (event == 'node') and (N_trial_end is not None) and (game.N_trial >= N_trial_end):
+                    raise _RestartDue()
+            cur_game.metrics.callback = check_budget
+            try:
+                cur_game.count_solutions(1,rng)
+            except _RestartDue:
+                cur_game._rollback(n_trail)
+                cur_game.N_guess_layer = 0
+                cur_game.is_valid = True
+                continue
+            N_trial = cur_game.N_trial + cur_game.N_trial_count # Restarted runs and last run
+            if cur_game.sol_mat is None:
+                return 'dead', None, N_trial
+            return 'solved', cur_game.sol_mat, N_trial
+    except _SearchStopped:
+        return 'stopped', None, cur_game.N_trial
+
+def split_game(cur_game,N_task):
+    ## Open boards of the top of the guess tree
+    # - Breadth first on the element with fewest values, dead boards dropped
+    # - Return (sub_list, sol_mat), sol_mat is set if solved while splitting
+    board_queue = collections.deque([np.copy(cur_game.cur_mat)])
+    while board_queue and (len(board_queue) < N_task):
+        sub_game = Sudoku(board_queue.popleft(),cur_game.N_block)
+        for rule_name, is_on in cur_game.rule_on.items():
+            sub_game.set_rule(rule_name,is_on)
+        sub_game._scan_till_end()
+        if sub_game.is_valid == False:
+            continue
+        if sub_game.is_solved == True:
+            return [], np.copy(sub_game.cur_mat)
+        n_element_fill = sub_game._mrv_element()
+        for val in sub_game._order_values(n_element_fill):
+            sub_mat = np.copy(sub_game.cur_mat)
+            sub_mat[sub_game.row_of[n_element_fill],sub_game.col_of[n_element_fill]] = val
+            board_queue.append(sub_mat)
+    return list(board_queue), None
+
+class ParallelSolver():
+    ## Process pool for parallel subtree search, reusable over games
+    def __init__(self,N_worker=None,N_task_worker=4):
+        self.N_worker = N_worker or os.cpu_count()
+        self.N_task_worker = N_task_worker # Tasks per worker from splitting
+        self.stop_event = multiprocessing.Event()
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            self.N_worker,initializer=_init_worker,initargs=(self.stop_event,))
+        self.N_task = 0 # Tasks of last game
+        self.N_trial = 0 # Search nodes of last game over all workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc_info):
+        self.close()
+
+    def close(self):
+        self.stop_event.set()
+        self.executor.shutdown(wait=True,cancel_futures=True)
+
+    def solve(self,cur_game,is_quiet=True):
+        ## Solve game in place, return is_solved
+        self.N_task = 0
+        self.N_trial = 0
+        cur_game._scan_till_end()
+        if (cur_game.is_valid == False) or (cur_game.is_solved == True):
+            return cur_game.is_solved
+
+        # Split and search
+        sub_list, sol_mat = split_game(cur_game,self.N_worker*self.N_task_worker)
+        if sol_mat is None:
+            task_list = [(sub_mat,cur_game.N_block,dict(cur_game.rule_on)) for sub_mat in sub_list]
+            sol_mat, _ = self._race(_search_task,task_list)
+        if sol_mat is None:
+            cur_game.is_valid = False # No solution in any subtree
+            if is_quiet == False:
+                print("Ended survey without solving")
+            return False
+
+        self._fill(cur_game,sol_mat)
+        if is_quiet == False:
+            print("Found solution over " + str(self.N_task) + " tasks at trial " + str(self.N_trial))
+        return cur_game.is_solved
+
+    def _fill(self,cur_game,sol_mat):
+        # Place solution in game
+        for n_element in range(cur_game.N_element):
+            if cur_game.is_placed[n_element] == False:
+                cur_game._place(n_element,int(sol_mat[cur_game.row_of[n_element],cur_game.col_of[n_element]]))
+        del cur_game.queue[:]
+        cur_game.N_trial += self.N_trial
+        cur_game.is_solved = (cur_game.N_placed == cur_game.N_element) and cur_game.is_valid
+
+    def _race(self,task_fn,task_list,is_dead_final=False):
+        ## First solution of tasks
+        # - Return (sol_mat, n_task), sol_mat is None if no task solved
+        # - With is_dead_final, a task proving no solution also ends the race
+        self.N_task = len(task_list)
+        self.stop_event.clear()
+        future_dict = {self.executor.submit(task_fn,task): n_task
+                       for n_task, task in enumerate(task_list)}
+        sol_mat = None
+        n_task_final = None
+        for future in concurrent.futures.as_completed(future_dict):
+            status, task_sol_mat, N_trial = future.result()
+            self.N_trial += N_trial
+            if (status == 'solved') or (is_dead_final and (status == 'dead')):
+                sol_mat = task_sol_mat
+                n_task_final = future_dict[future]
+                break
+
+        # Stop the rest before pool is used again
+        self.stop_event.set()
+        for future in future_dict:
+            future.cancel()
+        concurrent.futures.wait(future_dict)
+        return sol_mat, n_task_final
+
+class PortfolioSolver(ParallelSolver):
+    ## Race of strategy configs on the whole game
+    # - One worker per config by default, so all configs run at once
+    def __init__(self,N_worker=None,config_list=PORTFOLIO_LIST):
+        self.config_list = list(config_list)
+        super().__init__(N_worker or len(self.config_list))
+        self.winner = None # Name of config that ended last race
+
+    def solve(self,cur_game,is_quiet=True):
+        ## Solve game in place, return is_solved
+        self.N_task = 0
+        self.N_trial = 0
+        self.winner = None
+        cur_game._scan_till_end()
+        if (cur_game.is_valid == False) or (cur_game.is_solved == True):
+            return cur_game.is_solved
+
+        # Race
+        init_mat = np.copy(cur_game.cur_mat)
+        task_list = [(init_mat,cur_game.N_block,config) for config in self.config_list]
+        sol_mat, n_task = self._race(_portfolio_task,task_list,is_dead_final=True)
+        if n_task is not None:
+            self.winner = self.config_list[n_task]['name']
+        if sol_mat is None:
+            if n_task is not None:
+                cur_game.is_valid = False # Proven without solution
+            if is_quiet == False:
+                print("Ended survey without solving")
+            return False
+        self._fill(cur_game,sol_mat)
+        if is_quiet == False:
+            print("Found solution by " + self.winner + " at trial " + str(self.N_trial))
+        return cur_game.is_solved
+
+def solve_parallel(cur_game,N_worker=None,is_quiet=True):
+    # One-off parallel solve with its own pool
+    with ParallelSolver(N_worker) as solver:
+        return solver.solve(cur_game,is_quiet)
+
+def solve_portfolio(cur_game,N_worker=None,is_quiet=True):
+    # One-off portfolio solve with its own pool
+    with PortfolioSolver(N_worker) as solver:
+        return solver.solve(cur_game,is_quiet)
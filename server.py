@@ -0,0 +1,269 @@
+import sys
+import time
+import asyncio
+import argparse
+import multiprocessing
+import concurrent.futures
+from sudoku import Sudoku
+from store import line2mat, mat2line
+from canon import SolutionCache
+from main_stream import ENGINE_LIST, solve_game
+
+## Objective and procedure
+# Local solving server
+# - Clients send games over Unix or TCP socket, one per line (store line format)
+# - Server answers each line in request order:
+#   "game solution", "game -" if not solved or clues conflict, "game timeout" if not solved
+#   within time limit, "game error" if the line is not a game
+# - Blank and comment (#) lines are not answered
+# - Requests of all clients go to one bounded queue, a batcher groups them
+#   into batches of up to N_batch games for a process pool
+# - Full queue stops reading of sockets, so clients slow down instead of
+#   the server growing its memory (backpressure)
+# - Pool and solution cache live as long as the server, so process startup
+#   and cached games are paid once over all requests
+# - Each worker keeps its own SolutionCache, sharing the SQLite tier if
+#   --cache-path is given, so canonical forms are never made on the event loop
+# - Search of each game is capped at nodes the engine runs in t_timeout,
+#   and a batch skips games left once t_timeout has passed, so hard games
+#   cannot hold the pool beyond their reply time
+#
+# Usage
+#   python server.py --unix /tmp/sudoku.sock --worker 4
+#   python server.py --port 8765
+#   cat games.txt | nc -U /tmp/sudoku.sock
+#
+
+# Search nodes per second of each engine on 9x9, scaled down by element count
+NODE_RATE_DICT = {'dlx': 50000, 'search': 1000, 'ladder': 1000}
+
+_cache = None # SolutionCache of worker process
+
+def _init_worker(N_block,cache_path):
+    # Pool initializer: cache of this worker
+    global _cache
+    _cache = SolutionCache(N_block,db_path=cache_path)
+
+def is_consistent(init_mat,N_block=3):
+    # No value repeated in a row, column or block
+    cur_game = Sudoku(init_mat,N_block)
+    for unit in cur_game.unit_list:
+        val_list = [val for val in cur_game.cur_vect[unit] if val > 0]
+        if len(set(val_list)) != len(val_list):
+            return False
+    return True
+
+def solve_batch(task):
+    ## Worker task: solution lines of a batch of games
+    # - Return (out_list, N_hit), None in out_list if not solved
+    # - Games past t_timeout from start of batch are not solved
+    # - Solved games are added to cache after the batch, so the SQLite tier
+    #   is locked only for the write
+    mat_list, N_block, engine, N_node_max, t_timeout = task
+    t_start = time.perf_counter()
+    out_list = []
+    add_list = []
+    N_hit = 0
+    for init_mat in mat_list:
+        if (((t_timeout is not None) and (time.perf_counter() - t_start > t_timeout)) or
+            (is_consistent(init_mat,N_block) == False)):
+            out_list.append(None)
+            continue
+        sol_mat = _cache.lookup(init_mat)
+        if sol_mat is not None:
+            N_hit += 1
+        else:
+            sol_mat = solve_game(init_mat,N_block,engine,N_node_max)
+            if sol_mat is not None:
+                add_list.append((init_mat,sol_mat))
+        out_list.append(None if sol_mat is None else mat2line(sol_mat))
+    for init_mat, sol_mat in add_list:
+        _cache.add(init_mat,sol_mat)
+    _cache.commit()
+    return out_list, N_hit
+
+class SolveServer():
+    ## Batching front end of process pool
+    def __init__(self,N_block=3,engine='dlx',N_worker=1,N_batch=16,t_batch=0.005,
+                 N_queue=1024,t_timeout=10.0,cache_path=None):
+        self.N_block = N_block
+        self.engine = engine
+        self.N_worker = N_worker
+        self.N_batch = N_batch # Games per batch at most
+        self.t_batch = t_batch # Wait for more games before sending a partial batch
+        self.N_queue = N_queue # Requests waiting for batch at most
+        self.t_timeout = t_timeout # Time limit per request, None for none
+        self.cache_path = cache_path # SQLite file shared by worker caches, None for memory only
+        self.N_node_max = None # Search nodes per game at most
+        if t_timeout is not None:
+            self.N_node_max = max(int(t_timeout*NODE_RATE_DICT[engine]*81/N_block**4),1)
+        self.executor = None
+        self.queue = None
+        self.batch_sem = None
+        self.N_request = 0
+        self.N_hit = 0
+        self.N_timeout = 0
+
+    async def start(self,unix_path=None,host='127.0.0.1',port=8765):
+        ## Start pool, batcher and socket server
+        # Spawned workers, forked ones would hold client sockets open after close
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            self.N_worker,mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,initargs=(self.N_block,self.cache_path))
+        self.queue = asyncio.Queue(self.N_queue)
+        self.batch_sem = asyncio.Semaphore(2*self.N_worker) # Batches in pool at most
+        self.batch_task = asyncio.create_task(self._run_batcher())
+        if unix_path is not None:
+            self.server = await asyncio.start_unix_server(self._handle_client,unix_path,
+                                                          limit=1 << 20)
+        else:
+            self.server = await asyncio.start_server(self._handle_client,host,port,
+                                                     limit=1 << 20)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.batch_task.cancel()
+        self.executor.shutdown(wait=True,cancel_futures=True)
+
+    ## Request
+    async def solve_line(self,line):
+        ## Answer line of a game line
+        # - Raise ValueError if line is not a game
+        game = line2mat(line,self.N_block)
+        if game is None:
+            raise ValueError("Invalid game line: " + line)
+        init_line = mat2line(game[0])
+        self.N_request += 1
+
+        # Queue for batch, wait here while queue is full
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        deadline = None if self.t_timeout is None else loop.time() + self.t_timeout
+        await self.queue.put((game[0],future,deadline))
+        try:
+            sol_line = await asyncio.wait_for(asyncio.shield(future),
+                                              None if deadline is None else max(deadline - loop.time(),0))
+        except asyncio.TimeoutError:
+            self.N_timeout += 1
+            future.cancel() # Dropped by batcher if not sent yet
+            return init_line + ' timeout'
+        if sol_line is None:
+            return init_line + ' -'
+        return init_line + ' ' + sol_line
+
+    async def _handle_client(self,reader,writer):
+        ## Connection: answers in request order
+        # - Reader keeps at most N_batch answers pending per client
+        reply_queue = asyncio.Queue(self.N_batch)
+
+        async def write_replies():
+            while True:
+                reply_task = await reply_queue.get()
+                if reply_task is None:
+                    return
+                writer.write(((await reply_task) + '\n').encode())
+                await writer.drain()
+
+        writer_task = asyncio.create_task(write_replies())
+        try:
+            while True:
+                line_byte = await reader.readline()
+                if (len(line_byte) == 0) or writer_task.done():
+                    break
+                line = line_byte.decode(errors='replace').strip()
+                if (len(line) == 0) or line.startswith('#'):
+                    continue
+                await reply_queue.put(asyncio.create_task(self._solve_reply(line)))
+            await reply_queue.put(None)
+            await writer_task
+        except (ConnectionError,asyncio.CancelledError):
+            writer_task.cancel()
+        finally:
+            writer.close()
+
+    async def _solve_reply(self,line):
+        # Answer line, error line for lines that are not games
+        try:
+            return await self.solve_line(line)
+        except ValueError:
+            return line.split()[0] + ' error'
+
+    ## Batch
+    async def _run_batcher(self):
+        ## Group queued requests into batches for pool
+        loop = asyncio.get_running_loop()
+        while True:
+            item_list = [await self.queue.get()]
+            t_end = loop.time() + self.t_batch
+            while len(item_list) < self.N_batch:
+                try:
+                    item_list.append(await asyncio.wait_for(self.queue.get(),
+                                                            max(t_end - loop.time(),0)))
+                except asyncio.TimeoutError:
+                    break
+
+            # Drop requests timed out or cancelled while queued
+            t_now = loop.time()
+            item_list = [item for item in item_list
+                         if (not item[1].done()) and ((item[2] is None) or (item[2] > t_now))]
+            if len(item_list) == 0:
+                continue
+            await self.batch_sem.acquire()
+            task = ([item[0] for item in item_list],self.N_block,self.engine,
+                    self.N_node_max,self.t_timeout)
+            batch_future = loop.run_in_executor(self.executor,solve_batch,task)
+            batch_future.add_done_callback(lambda batch_future, item_list=item_list:
+                                           self._finish_batch(batch_future,item_list))
+
+    def _finish_batch(self,batch_future,item_list):
+        # Hand out batch results
+        self.batch_sem.release()
+        if batch_future.cancelled():
+            return
+        if batch_future.exception() is not None:
+            for _, future, _ in item_list:
+                if not future.done():
+                    future.set_exception(batch_future.exception())
+            return
+        out_list, N_hit = batch_future.result()
+        self.N_hit += N_hit
+        for (_, future, _), sol_line in zip(item_list,out_list):
+            if not future.done():
+                future.set_result(sol_line)
+
+async def main_server(args):
+    ## Serve until interrupted
+    server = SolveServer(args.block,args.engine,args.worker,args.batch,args.batch_wait,
+                         args.queue,args.timeout,args.cache_path)
+    await server.start(args.unix,args.host,args.port)
+    address = args.unix if args.unix else "{}:{}".format(args.host,args.port)
+    print("Serving on " + address,file=sys.stderr)
+    t_start = time.perf_counter()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+        print("Served {} games in {:.2f} sec, {} cached, {} timed out".format(
+              server.N_request,time.perf_counter()-t_start,server.N_hit,server.N_timeout),
+              file=sys.stderr)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sudoku solving server, one game per line")
+    parser.add_argument('--unix',default=None,help="Unix socket path, TCP if not given")
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8765)
+    parser.add_argument('--engine',choices=ENGINE_LIST,default='dlx')
+    parser.add_argument('--block',type=int,default=3,help="N_block, 4 or 5 for 16x16 or 25x25")
+    parser.add_argument('--worker',type=int,default=1,help="Process count")
+    parser.add_argument('--batch',type=int,default=16,help="Games per batch at most")
+    parser.add_argument('--batch-wait',type=float,default=0.005,help="Seconds to fill a batch")
+    parser.add_argument('--queue',type=int,default=1024,help="Queued games at most")
+    parser.add_argument('--timeout',type=float,default=10.0,help="Seconds per game")
+    parser.add_argument('--cache-path',default=None,help="SQLite file of solution cache")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main_server(args))
+    except KeyboardInterrupt:
+        pass
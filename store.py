@@ -0,0 +1,174 @@
+import os
+import numpy as np
+
+## Game store
+# Two formats for games and solutions
+# - Line: one game per line, N_size**2 characters, '.' for empty,
+#   values over 9 as letters (A=10, ..., P=25), solution after space
+# - Binary: fixed-size records after 16 byte header
+#   * Header: b'SDKS', version, N_block, bits per value, padding
+#   * Record: game, solution (packed 4 bits per value up to 15x15, else 8 bits),
+#     solved layer (uint8) and trial count (uint32)
+#   * Records are appended in bulk and read by memory map
+#
+
+VAL_CHAR = '.123456789ABCDEFGHIJKLMNOP'
+HEADER_MAGIC = b'SDKS'
+HEADER_SIZE = 16
+STORE_VERSION = 1
+
+## Line format
+def mat2line(cur_mat):
+    # Line of a game
+    return ''.join(VAL_CHAR[cur_val] for cur_val in np.asarray(cur_mat).flatten())
+
+def line2mat(line,N_block=3):
+    ## Game and solution of a line
+    # - Return (init_mat, sol_mat), sol_mat is None if not in line
+    # - Return None for blank or comment (#) line
+    # - Raise ValueError if line is not a game
+    line = line.strip()
+    if (len(line) == 0) or line.startswith('#'):
+        return None
+    N_size = N_block**2
+    field_list = line.split()
+    mat_list = []
+    for field in field_list[:2]:
+        if len(field) != N_size**2:
+            break
+        val_list = [0 if ch in '.0' else int(ch,36) for ch in field]
+        if max(val_list) > N_size:
+            raise ValueError("Value above " + str(N_size) + " in game line: " + line)
+        mat_list.append(np.reshape(val_list,(N_size,N_size)))
+    if len(mat_list) == 0:
+        raise ValueError("Invalid game line: " + line)
+    if len(mat_list) == 1:
+        mat_list.append(None)
+    return mat_list[0], mat_list[1]
+
+def write_lines(file_path,init_arr,sol_arr=None,mode='a'):
+    # Append games (and solutions) in line format at once
+    line_list = []
+    for n_game in range(len(init_arr)):
+        line = mat2line(init_arr[n_game])
+        if sol_arr is not None:
+            line += ' ' + mat2line(sol_arr[n_game])
+        line_list.append(line + '\n')
+    with open(file_path,mode) as file:
+        file.writelines(line_list)
+
+def load_lines(file_path,N_block=3):
+    ## (N_game, N_size, N_size) games and solutions of line file
+    # Solutions are None unless every line has one
+    init_list = []
+    sol_list = []
+    with open(file_path) as file:
+        for line in file:
+            game = line2mat(line,N_block)
+            if game is not None:
+                init_list.append(game[0])
+                sol_list.append(game[1])
+    N_size = N_block**2
+    init_arr = np.reshape(np.array(init_list,dtype=np.int8),(-1,N_size,N_size))
+    if (len(sol_list) == 0) or any(sol_mat is None for sol_mat in sol_list):
+        return init_arr, None
+    return init_arr, np.array(sol_list,dtype=np.int8)
+
+## Binary format
+def _pack(mat_arr,N_bit):
+    # (N_game, N_size, N_size) values to (N_game, N_byte) bytes
+    N_game = np.shape(mat_arr)[0]
+    val_arr = np.reshape(np.asarray(mat_arr,dtype=np.uint8),(N_game,-1))
+    if N_bit == 8:
+        return val_arr
+    if np.shape(val_arr)[1] % 2:
+        val_arr = np.concatenate((val_arr,np.zeros((N_game,1),dtype=np.uint8)),axis=1)
+    return (val_arr[:,0::2] << 4) | val_arr[:,1::2]
+
+def _unpack(byte_arr,N_bit,N_size):
+    # (N_game, N_byte) bytes to (N_game, N_size, N_size) values
+    N_game = np.shape(byte_arr)[0]
+    if N_bit == 8:
+        val_arr = np.asarray(byte_arr,dtype=np.int8)
+    else:
+        val_arr = np.empty((N_game,2*np.shape(byte_arr)[1]),dtype=np.int8)
+        val_arr[:,0::2] = byte_arr >> 4
+        val_arr[:,1::2] = byte_arr & 0x0F
+    return np.reshape(val_arr[:,:N_size**2],(N_game,N_size,N_size))
+
+class GameStore():
+    ## Binary store of fixed-size game records
+    def __init__(self,file_path,N_block=3):
+        self.file_path = file_path
+        if os.path.exists(file_path) and os.path.getsize(file_path) >= HEADER_SIZE:
+            # Existing store
+            with open(file_path,'rb') as file:
+                header = file.read(HEADER_SIZE)
+            if header[:4] != HEADER_MAGIC:
+                raise ValueError("Not a game store: " + file_path)
+            if header[4] != STORE_VERSION:
+                raise ValueError("Unsupported store version " + str(header[4]) + ": " + file_path)
+            N_block = header[5]
+            N_bit = header[6]
+        else:
+            # New store
+            N_bit = 4 if N_block**2 <= 15 else 8
+            header = HEADER_MAGIC + bytes([STORE_VERSION,N_block,N_bit])
+            with open(file_path,'wb') as file:
+                file.write(header + bytes(HEADER_SIZE-len(header)))
+        self.N_block = N_block
+        self.N_size = N_block**2
+        self.N_bit = N_bit
+        N_byte = (self.N_size**2*N_bit + 7)//8
+        self.dtype = np.dtype([('init',np.uint8,(N_byte,)),
+                               ('sol',np.uint8,(N_byte,)),
+                               ('N_layer',np.uint8),
+                               ('N_trial','<u4')])
+        self._mmap = None # Memory map, reopened when store grows
+
+    def __len__(self):
+        return (os.path.getsize(self.file_path) - HEADER_SIZE)//self.dtype.itemsize
+
+    def append(self,init_arr,sol_arr=None,N_layer_arr=None,N_trial_arr=None):
+        ## Append games in bulk with one write
+        init_arr = np.reshape(init_arr,(-1,self.N_size,self.N_size))
+        N_game = np.shape(init_arr)[0]
+        record_arr = np.zeros(N_game,dtype=self.dtype)
+        record_arr['init'] = _pack(init_arr,self.N_bit)
+        if sol_arr is not None:
+            record_arr['sol'] = _pack(np.reshape(sol_arr,(-1,self.N_size,self.N_size)),self.N_bit)
+        if N_layer_arr is not None:
+            record_arr['N_layer'] = N_layer_arr
+        if N_trial_arr is not None:
+            record_arr['N_trial'] = N_trial_arr
+        with open(self.file_path,'ab') as file:
+            file.write(record_arr.tobytes())
+        self._mmap = None
+
+    def _record(self):
+        # Memory map of all records
+        N_game = len(self)
+        if (self._mmap is None) or (len(self._mmap) != N_game):
+            if N_game == 0:
+                return np.zeros(0,dtype=self.dtype)
+            self._mmap = np.memmap(self.file_path,dtype=self.dtype,mode='r',
+                                   offset=HEADER_SIZE,shape=(N_game,))
+        return self._mmap
+
+    def __getitem__(self,index):
+        ## Game, solution, layer, trial of a record (or arrays for a slice)
+        record = self._record()[index]
+        if isinstance(index,slice):
+            return (_unpack(record['init'],self.N_bit,self.N_size),
+                    _unpack(record['sol'],self.N_bit,self.N_size),
+                    np.array(record['N_layer']),
+                    np.array(record['N_trial']))
+        return (_unpack(record['init'][None],self.N_bit,self.N_size)[0],
+                _unpack(record['sol'][None],self.N_bit,self.N_size)[0],
+                int(record['N_layer']),
+                int(record['N_trial']))
+
+    def load(self,n_start=0,n_end=None):
+        # (N_game, N_size, N_size) games and solutions ready for solving
+        init_arr, sol_arr, _, _ = self[n_start:n_end]
+        return init_arr, sol_arr
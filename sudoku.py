@@ -1,9 +1,9 @@
 import itertools
+import functools
+import collections
 import numpy as np
-import matplotlib.pyplot as plt
 import time
-import cProfile
-import subprocess
+from dlx import build_sudoku_cover
 
 ## Sudoku class
 # All element positions have valid list of numbers
@@ -14,6 +14,275 @@ import subprocess
 # Author: Jinwook Lee
 #
 
+## Candidate bitmask helpers
+# Candidates of a cell are stored as an integer bitmask
+# - Bit (val-1) is set if val is still valid, e.g. 0b101 for {1, 3}
+# - Single bit set means the cell is determined
+def _bit_count(mask):
+    return bin(mask).count('1')
+
+if hasattr(int, 'bit_count'): # Python 3.10+
+    _bit_count = int.bit_count
+
+def _mask2list(mask):
+    # List of values of a bitmask in increasing order
+    val_list = []
+    while mask:
+        bit = mask & -mask
+        val_list.append(bit.bit_length())
+        mask ^= bit
+    return val_list
+
+_index_table_cache = {}
+
+def _build_index_table(N_block):
+    ## Index table for each element position
+    # - Row, column and block number
+    # - Peer list: other elements sharing row, column or block
+    # - Unit list: elements of each row, column and block in this order
+    # - Built once per block size and shared by all games
+    if N_block in _index_table_cache:
+        return _index_table_cache[N_block]
+    N_size = N_block**2
+    N_element = N_size**2
+    row_of = [n_element//N_size for n_element in range(N_element)]
+    col_of = [n_element%N_size for n_element in range(N_element)]
+    block_of = [(row_of[n_element]//N_block)*N_block + col_of[n_element]//N_block
+                for n_element in range(N_element)]
+    peer_list = []
+    for n_element in range(N_element):
+        peer_list.append([n_peer for n_peer in range(N_element)
+                          if n_peer != n_element and
+                          (row_of[n_peer] == row_of[n_element] or
+                           col_of[n_peer] == col_of[n_element] or
+                           block_of[n_peer] == block_of[n_element])])
+    unit_list = ([[n_element for n_element in range(N_element) if row_of[n_element] == n_unit]
+                  for n_unit in range(N_size)] +
+                 [[n_element for n_element in range(N_element) if col_of[n_element] == n_unit]
+                  for n_unit in range(N_size)] +
+                 [[n_element for n_element in range(N_element) if block_of[n_element] == n_unit]
+                  for n_unit in range(N_size)])
+    _index_table_cache[N_block] = (row_of, col_of, block_of, peer_list, unit_list)
+    return _index_table_cache[N_block]
+
+_zobrist_cache = {}
+
+def _build_zobrist_table(N_block):
+    ## Zobrist key of each placement, key[n_element*N_size + val-1]
+    # - Board hash is XOR of keys of placed values, updated on place and undo
+    # - Fixed seed so that hashes agree across processes
+    if N_block in _zobrist_cache:
+        return _zobrist_cache[N_block]
+    N_size = N_block**2
+    rng = np.random.default_rng(N_block)
+    zobrist = [int(key) for key in rng.integers(0,1 << 63,N_size**3,dtype=np.int64)]
+    _zobrist_cache[N_block] = zobrist
+    return zobrist
+
+## Inference rules applied in propagation
+# - Applied in this order after placement queue is empty
+# - Method _rule_<name> of Sudoku returns number of eliminations, -1 if invalid
+RULE_LIST = ('hidden_single',
+             'pointing', # Pointing pair/triple and box-line reduction
+             'naked_pair',
+             'hidden_pair',
+             'naked_triple',
+             'hidden_triple')
+
+## Difficulty level by inference rules needed to solve without guess
+# - Level 1: naked single only
+# - Level 2: + hidden single
+# - Level 3: + pointing and box-line reduction
+# - Level 4: + naked/hidden pair and triple
+# - Level 5: guess required
+LEVEL_RULE_LIST = ((),
+                   ('hidden_single',),
+                   ('hidden_single','pointing'),
+                   RULE_LIST)
+
+def rate_difficulty(init_mat,N_block=3):
+    ## Difficulty level of game, 0 if invalid
+    # Rules are switched on level by level on the same board
+    game = Sudoku(init_mat,N_block)
+    for n_level, rule_on_list in enumerate(LEVEL_RULE_LIST):
+        for rule_name in game.rule_list:
+            game.set_rule(rule_name,rule_name in rule_on_list)
+        game._scan_till_end()
+        if game.is_valid == False:
+            return 0
+        if game.is_solved == True:
+            return n_level + 1
+    return len(LEVEL_RULE_LIST) + 1
+
+## Solved game generators
+# - gen_solved_grid: random transforms of a base game, fastest
+# - gen_solved_grid_batch: same, vectorized for many games at once
+# - gen_solved_grid_search: randomized backtracking with propagation,
+#   covers every solved game
+def transform_game(cur_mat,row_perm,col_perm,val_perm,is_transpose=False):
+    ## Game after validity-preserving transform
+    # - row_perm, col_perm: new row (column) n is old row (column) perm[n]
+    # - val_perm: value v is relabeled to val_perm[v-1], 0 is kept
+    # - Transpose is applied last
+    cur_mat = np.asarray(cur_mat)
+    val_map = np.concatenate(([0],val_perm))
+    new_mat = val_map[cur_mat[np.ix_(row_perm,col_perm)]]
+    if is_transpose:
+        new_mat = new_mat.T
+    return np.ascontiguousarray(new_mat)
+
+def _base_grid(N_block):
+    # Pattern solved game, e.g. 1 2 3 | 4 5 6 | 7 8 9 on first row
+    N_size = N_block**2
+    n_row, n_col = np.indices((N_size,N_size))
+    return (n_row*N_block + n_row//N_block + n_col) % N_size + 1
+
+def _random_band_perm(rng,N_block,N_grid):
+    # Row (column) permutations keeping bands (stacks): (N_grid, N_size)
+    band_perm = np.argsort(rng.random((N_grid,N_block)),axis=1)
+    in_perm = np.argsort(rng.random((N_grid,N_block,N_block)),axis=2)
+    return (band_perm[:,:,None]*N_block + in_perm).reshape(N_grid,N_block**2)
+
+def gen_solved_grid(rng=None,N_block=3,base_mat=None):
+    ## Random solved game from transforms of base_mat (pattern game if None)
+    if rng is None:
+        rng = np.random.default_rng()
+    if base_mat is None:
+        base_mat = _base_grid(N_block)
+    return transform_game(base_mat,
+                          _random_band_perm(rng,N_block,1)[0],
+                          _random_band_perm(rng,N_block,1)[0],
+                          rng.permutation(N_block**2) + 1,
+                          rng.random() < 0.5)
+
+def gen_solved_grid_batch(N_grid,rng=None,N_block=3,base_mat=None):
+    ## (N_grid, N_size, N_size) random solved games, same as gen_solved_grid
+    if rng is None:
+        rng = np.random.default_rng()
+    if base_mat is None:
+        base_mat = _base_grid(N_block)
+    N_size = N_block**2
+    row_perm = _random_band_perm(rng,N_block,N_grid)
+    col_perm = _random_band_perm(rng,N_block,N_grid)
+    val_perm = np.argsort(rng.random((N_grid,N_size)),axis=1) + 1
+    grid_arr = np.asarray(base_mat)[row_perm[:,:,None],col_perm[:,None,:]]
+    is_transpose = rng.random(N_grid) < 0.5
+    grid_arr[is_transpose] = np.transpose(grid_arr[is_transpose],(0,2,1))
+    grid_arr = np.take_along_axis(val_perm,(grid_arr-1).reshape(N_grid,-1),axis=1)
+    return grid_arr.reshape(N_grid,N_size,N_size)
+
+def gen_solved_grid_search(rng=None,N_block=3):
+    ## Random solved game from empty board with random value order
+    # Naked single is enough here, dead ends are rare on open board
+    if rng is None:
+        rng = np.random.default_rng()
+    N_size = N_block**2
+    game = Sudoku(np.zeros((N_size,N_size),dtype=int),N_block)
+    for rule_name in game.rule_list:
+        game.set_rule(rule_name,False)
+    game.count_solutions(1,rng)
+    return game.sol_mat
+
+## Search metrics
+# Attach SearchMetrics to Sudoku.metrics to collect, None (default) to disable
+# - Hooks are skipped by a single None check when disabled
+# - One SearchMetrics can be shared by many games to aggregate
+# - callback(event, game) is called on 'node', 'backtrack' and 'solution'
+class SearchMetrics():
+    def __init__(self,callback=None):
+        self.N_node = 0 # Guesses placed
+        self.N_backtrack = 0 # Guesses undone
+        self.N_solution = 0 # Solutions found
+        self.N_propagate = 0 # Propagation passes
+        self.N_layer_max = 0 # Deepest guess layer reached
+        self.elim_dict = {} # Eliminations per inference rule
+        self.t_phase = {'propagate': 0.0} # Time [s] of propagation and each search engine
+        self.callback = callback
+
+    def on_propagate(self,t_elapsed):
+        self.N_propagate += 1
+        self.t_phase['propagate'] += t_elapsed
+
+    def on_elim(self,rule_name,N_elim):
+        self.elim_dict[rule_name] = self.elim_dict.get(rule_name,0) + N_elim
+
+    def on_node(self,game):
+        self.N_node += 1
+        if game.N_guess_layer > self.N_layer_max:
+            self.N_layer_max = game.N_guess_layer
+        if self.callback is not None:
+            self.callback('node',game)
+
+    def on_backtrack(self,game):
+        self.N_backtrack += 1
+        if self.callback is not None:
+            self.callback('backtrack',game)
+
+    def on_solution(self,game):
+        self.N_solution += 1
+        if self.callback is not None:
+            self.callback('solution',game)
+
+    def on_search(self,engine_name,t_elapsed):
+        self.t_phase[engine_name] = self.t_phase.get(engine_name,0.0) + t_elapsed
+
+    def summary(self):
+        # Dictionary of all metrics
+        return {'N_node': self.N_node,
+                'N_backtrack': self.N_backtrack,
+                'N_solution': self.N_solution,
+                'N_propagate': self.N_propagate,
+                'N_layer_max': self.N_layer_max,
+                'elim_dict': dict(self.elim_dict),
+                't_phase': dict(self.t_phase)}
+
+## Dead state table
+# Transposition table of boards proven to have no solution
+# - Key is Zobrist hash of placed values, so a board reached again by another
+#   guess order or propagation path is cut off without search
+# - Dead is a property of the placed values only, so table can be shared
+#   by games of the same size
+# - Only complete failures are recorded, never boards cut by guess layer
+#   or trial limits
+# - Least recently used boards are evicted beyond N_entry_max
+# - Attach to Sudoku.dead_table to use, None (default) to disable
+class DeadStateTable():
+    def __init__(self,N_entry_max=1 << 16):
+        self.N_entry_max = N_entry_max
+        self.table = collections.OrderedDict()
+        self.N_hit = 0
+        self.N_evict = 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self,board_hash):
+        if board_hash in self.table:
+            self.table.move_to_end(board_hash)
+            self.N_hit += 1
+            return True
+        return False
+
+    def add(self,board_hash):
+        self.table[board_hash] = True
+        self.table.move_to_end(board_hash)
+        if len(self.table) > self.N_entry_max:
+            self.table.popitem(last=False)
+            self.N_evict += 1
+
+def _search_phase(method):
+    # Record elapsed time of search entry point if metrics attached
+    @functools.wraps(method)
+    def wrapper(self,*args,**kwargs):
+        if self.metrics is None:
+            return method(self,*args,**kwargs)
+        t_start = time.perf_counter()
+        try:
+            return method(self,*args,**kwargs)
+        finally:
+            self.metrics.on_search(method.__name__,time.perf_counter()-t_start)
+    return wrapper
+
 class Sudoku():
     ## Class to control setup
     def __init__(self,init_mat,N_block=3):
@@ -21,144 +290,452 @@ class Sudoku():
         self.N_block = N_block # 3x3 is base block
         self.N_size = self.N_block**2 # 9x9 as default
         self.N_element = self.N_size**2 # 81 elements for default
-        self.cur_mat = np.copy(init_mat) # np.zeros((N_size*N_size))
+        self.cur_vect = np.array(init_mat).flatten() # Flat board, element n at n
+        self.cur_mat = self.cur_vect.reshape(self.N_size,self.N_size) # (N_size, N_size) view of cur_vect
         self.N_guess_layer = 0 # Current layer of guess
         self.N_trial = 0 # Current trial counter
         self.N_layer_solved = 0 # Layer at solution
+        self.N_trial_count = 0 # Search nodes of last count_solutions, not added to N_trial
+        self.metrics = None # SearchMetrics, None to disable
+        self.dead_table = None # DeadStateTable of boards without solution, None to disable
+        self._frontier_list = None # Boards cut by guess layer limit, collected by solve_deepening
 
         # Sanity check
         assert np.shape(init_mat) == (self.N_size,self.N_size)
-        assert np.max(init_mat) <= 9
+        assert np.max(init_mat) <= self.N_size
         assert np.max(init_mat) >= 0
 
         # Status flag
         self.is_valid = True
-        self.is_solved = np.size(self.cur_mat[self.cur_mat==0]) == 0
+        self.is_solved = False # Set once givens are placed
         
-        # List of valid numbers on each position
-        self.val_list = np.ndarray((self.N_element),dtype=object)
+        # Index table
+        (self.row_of, self.col_of, self.block_of,
+         self.peer_list, self.unit_list) = _build_index_table(self.N_block)
+
+        # Inference rules
+        # - rule_on: toggle of each rule
+        # - rule_count: number of eliminations made by each rule
+        self.rule_list = list(RULE_LIST)
+        self.rule_on = {rule_name: True for rule_name in self.rule_list}
+        self.rule_count = {rule_name: 0 for rule_name in self.rule_list}
+
+        # Bitmask of valid numbers on each position
+        # and bitmask of numbers already used on each row, column and block
+        self.N_full = (1 << self.N_size) - 1 # e.g. 0b111111111
+        self.val_mask = [self.N_full]*self.N_element
+        self.row_used = [0]*self.N_size
+        self.col_used = [0]*self.N_size
+        self.block_used = [0]*self.N_size
+        self.is_placed = [False]*self.N_element
+        self.N_placed = 0 # Count of determined elements
+        self.queue = [] # Elements reduced to single value, to be placed
+        self.trail = [] # Undo log of placements and eliminations
+        self.zobrist = _build_zobrist_table(self.N_block)
+        self.board_hash = 0 # Zobrist hash of placed values
+
+        # Open elements by number of valid values, e.g. size_bucket[2] for pairs
+        # - Kept up to date by _place, _eliminate and _rollback
+        # - Element with fewest values is found without scanning the board
+        self.size_bucket = [set() for _ in range(self.N_size+1)]
+        self.size_bucket[self.N_size].update(range(self.N_element))
         for n_element in range(self.N_element):
-            n_row = int(n_element/self.N_size)
-            n_col = np.remainder(n_element,self.N_size)
-            cur_val = self.cur_mat[n_row,n_col]
+            cur_val = int(self.cur_vect[n_element])
             if cur_val != 0:
                 # Single value if already solved
-                self.val_list[n_element] = np.array([cur_val])
+                if self._place(n_element,cur_val) == False:
+                    self.is_valid = False # Duplicate in input
+        self.is_solved = (self.N_placed == self.N_element) and self.is_valid
+
+    def _place(self,n_element,val):
+        ## Fill in val at n_element
+        # - Update used masks of row, column and block incrementally
+        # - Eliminate val from peers only, and queue peers left with single value
+        # - Return False if val is already used or any peer runs out of values
+        n_row = self.row_of[n_element]
+        n_col = self.col_of[n_element]
+        n_block = self.block_of[n_element]
+        bit = 1 << (val-1)
+        if (self.row_used[n_row] | self.col_used[n_col] | self.block_used[n_block]) & bit:
+            return False
+        self.row_used[n_row] |= bit
+        self.col_used[n_col] |= bit
+        self.block_used[n_block] |= bit
+        self.trail.append((n_element,self.val_mask[n_element]))
+        self.trail.append((~n_element,bit))
+        self.size_bucket[_bit_count(self.val_mask[n_element])].remove(n_element)
+        self.val_mask[n_element] = bit
+        self.is_placed[n_element] = True
+        self.board_hash ^= self.zobrist[n_element*self.N_size + val-1]
+        self.cur_vect[n_element] = val
+        self.N_placed += 1
+
+        # Peer elimination
+        val_mask = self.val_mask
+        trail = self.trail
+        size_bucket = self.size_bucket
+        for n_peer in self.peer_list[n_element]:
+            cur_mask = val_mask[n_peer]
+            if cur_mask & bit:
+                trail.append((n_peer,cur_mask))
+                N_val = _bit_count(cur_mask)
+                size_bucket[N_val].remove(n_peer)
+                size_bucket[N_val-1].add(n_peer)
+                cur_mask ^= bit
+                val_mask[n_peer] = cur_mask
+                if cur_mask == 0:
+                    return False # No more valid list
+                if cur_mask & (cur_mask-1) == 0:
+                    self.queue.append(n_peer)
+        return True
+
+    def _eliminate(self,n_element,mask):
+        ## Remove values in mask from n_element
+        # - Queue n_element if left with single value
+        # - Return number of eliminated values, -1 if no value left
+        cur_mask = self.val_mask[n_element]
+        rem_mask = cur_mask & mask
+        if rem_mask == 0:
+            return 0
+        self.trail.append((n_element,cur_mask))
+        if self.is_placed[n_element] == False:
+            self.size_bucket[_bit_count(cur_mask)].remove(n_element)
+            self.size_bucket[_bit_count(cur_mask ^ rem_mask)].add(n_element)
+        cur_mask ^= rem_mask
+        self.val_mask[n_element] = cur_mask
+        if cur_mask == 0:
+            return -1
+        if cur_mask & (cur_mask-1) == 0:
+            self.queue.append(n_element)
+        return _bit_count(rem_mask)
+
+    def _rollback(self,n_trail):
+        ## Undo placements and eliminations back to trail length n_trail
+        trail = self.trail
+        val_mask = self.val_mask
+        size_bucket = self.size_bucket
+        while len(trail) > n_trail:
+            n_element, old_mask = trail.pop()
+            if n_element >= 0:
+                # Elimination
+                if self.is_placed[n_element] == False:
+                    size_bucket[_bit_count(val_mask[n_element])].remove(n_element)
+                    size_bucket[_bit_count(old_mask)].add(n_element)
+                val_mask[n_element] = old_mask
             else:
-                # Full list if not solved
-                self.val_list[n_element] = np.arange(self.N_size)+1 # e.g. 1, ..., 9
+                # Placement
+                n_element = ~n_element
+                self.row_used[self.row_of[n_element]] ^= old_mask
+                self.col_used[self.col_of[n_element]] ^= old_mask
+                self.block_used[self.block_of[n_element]] ^= old_mask
+                self.is_placed[n_element] = False
+                self.board_hash ^= self.zobrist[n_element*self.N_size + old_mask.bit_length()-1]
+                size_bucket[1].add(n_element) # Back to open with single value
+                self.cur_vect[n_element] = 0
+                self.N_placed -= 1
+        del self.queue[:]
 
-    def _copy_A2B(self,A,B):
-        ## Copy A to B
-        # Basic
-        B.N_block = np.copy(A.N_block)
-        B.N_size = np.copy(A.N_size)
-        B.N_element = np.copy(A.N_element)
-        B.cur_mat = np.copy(A.cur_mat)
+    def _propagate(self):
+        # Propagation with time record if metrics attached
+        if self.metrics is None:
+            return self._propagate_rules()
+        t_start = time.perf_counter()
+        is_valid = self._propagate_rules()
+        self.metrics.on_propagate(time.perf_counter()-t_start)
+        return is_valid
+
+    def _propagate_rules(self):
+        ## Place queued elements and apply inference rules until nothing changes
+        # - Only peers of newly placed elements are revisited
+        # - Rules are tried in order and restart from the first one
+        #   once any of them makes elimination
+        # - Return False as soon as contradiction is found
+        while True:
+            while self.queue:
+                n_element = self.queue.pop()
+                if self.is_placed[n_element]:
+                    continue
+                cur_mask = self.val_mask[n_element]
+                if cur_mask == 0:
+                    return False
+                if self._place(n_element,cur_mask.bit_length()) == False:
+                    return False
+            if self.N_placed == self.N_element:
+                return True
+
+            # Inference rules
+            for rule_name in self.rule_list:
+                if self.rule_on[rule_name] == False:
+                    continue
+                N_elim = getattr(self,'_rule_' + rule_name)()
+                if N_elim < 0:
+                    return False
+                if N_elim > 0:
+                    self.rule_count[rule_name] += N_elim
+                    if self.metrics is not None:
+                        self.metrics.on_elim(rule_name,N_elim)
+                    break
+            else:
+                return True
+
+    def set_rule(self,rule_name,is_on=True):
+        # Toggle inference rule
+        assert rule_name in self.rule_on
+        self.rule_on[rule_name] = is_on
+
+    def _rule_hidden_single(self):
+        ## Value with single position in a unit
+        val_mask = self.val_mask
+        N_elim = 0
+        for unit in self.unit_list:
+            # Values found once and more than once in the unit
+            once_mask = 0
+            twice_mask = 0
+            for n_element in unit:
+                cur_mask = val_mask[n_element]
+                twice_mask |= once_mask & cur_mask
+                once_mask |= cur_mask
+            if once_mask != self.N_full:
+                return -1 # Value with no position
+            single_mask = once_mask & ~twice_mask
+            if single_mask == 0:
+                continue
+
+            # Fill in
+            for n_element in unit:
+                cur_mask = val_mask[n_element]
+                bit = cur_mask & single_mask
+                if (bit == 0) or (bit == cur_mask):
+                    continue
+                if bit & (bit-1):
+                    return -1 # Two values with the same single position
+                N_cur = self._eliminate(n_element,cur_mask ^ bit)
+                if N_cur < 0:
+                    return -1
+                N_elim += N_cur
+        return N_elim
+
+    def _rule_pointing(self):
+        ## Pointing and box-line reduction
+        # - Value in a block confined to a row (column):
+        #   remove from the rest of the row (column)
+        # - Value in a row (column) confined to a block:
+        #   remove from the rest of the block
+        # Segment: N_block elements shared by a row (column) and a block
+        N_block = self.N_block
+        N_size = self.N_size
+        unit_list = self.unit_list
+        val_mask = self.val_mask
+        N_elim = 0
+        for n_dir, line_used in ((0,self.row_used),(1,self.col_used)):
+            # Values of each segment, seg_table[n_line][n_seg]
+            seg_table = []
+            for n_line in range(N_size):
+                line = unit_list[n_dir*N_size + n_line]
+                seg_list = []
+                for n_seg in range(N_block):
+                    seg_mask = 0
+                    for n_element in line[n_seg*N_block:(n_seg+1)*N_block]:
+                        seg_mask |= val_mask[n_element]
+                    seg_list.append(seg_mask)
+                seg_table.append(seg_list)
+
+            for n_line in range(N_size):
+                line = unit_list[n_dir*N_size + n_line]
+                n_group = n_line//N_block # Band (stack) of the row (column)
+                line_other_list = [n_line_other for n_line_other in range(n_group*N_block,(n_group+1)*N_block)
+                                   if n_line_other != n_line]
+                for n_seg in range(N_block):
+                    seg_mask = seg_table[n_line][n_seg]
+                    if n_dir == 0:
+                        n_block = n_group*N_block + n_seg
+                    else:
+                        n_block = n_seg*N_block + n_group
+
+                    # Box-line: value of the line only in this segment
+                    other_mask = 0
+                    for n_seg_other in range(N_block):
+                        if n_seg_other != n_seg:
+                            other_mask |= seg_table[n_line][n_seg_other]
+                    only_mask = seg_mask & ~other_mask & ~line_used[n_line]
+                    if only_mask:
+                        for n_line_other in line_other_list:
+                            for n_element in unit_list[n_dir*N_size + n_line_other][n_seg*N_block:(n_seg+1)*N_block]:
+                                if val_mask[n_element] & only_mask == 0:
+                                    continue # Nothing to remove, skip the call
+                                N_cur = self._eliminate(n_element,only_mask)
+                                if N_cur < 0:
+                                    return -1
+                                N_elim += N_cur
+
+                    # Pointing: value of the block only in this segment
+                    other_mask = 0
+                    for n_line_other in line_other_list:
+                        other_mask |= seg_table[n_line_other][n_seg]
+                    only_mask = seg_mask & ~other_mask & ~self.block_used[n_block]
+                    if only_mask:
+                        for n_seg_other in range(N_block):
+                            if n_seg_other == n_seg:
+                                continue
+                            for n_element in line[n_seg_other*N_block:(n_seg_other+1)*N_block]:
+                                if val_mask[n_element] & only_mask == 0:
+                                    continue
+                                N_cur = self._eliminate(n_element,only_mask)
+                                if N_cur < 0:
+                                    return -1
+                                N_elim += N_cur
+        return N_elim
+
+    def _rule_naked_pair(self):
+        return self._naked_subset(2)
+
+    def _rule_naked_triple(self):
+        return self._naked_subset(3)
+
+    def _rule_hidden_pair(self):
+        return self._hidden_subset(2)
+
+    def _rule_hidden_triple(self):
+        return self._hidden_subset(3)
+
+    def _naked_subset(self,N_sub):
+        ## N_sub elements in a unit sharing N_sub values in total
+        # - Remove these values from the rest of the unit
+        val_mask = self.val_mask
+        N_elim = 0
+        for unit in self.unit_list:
+            open_list = [n_element for n_element in unit if self.is_placed[n_element] == False]
+            if len(open_list) <= N_sub:
+                continue
+            sel_list = [n_element for n_element in open_list
+                        if _bit_count(val_mask[n_element]) <= N_sub]
+            for n_element_tuple in itertools.combinations(sel_list,N_sub):
+                sub_mask = 0
+                for n_element in n_element_tuple:
+                    sub_mask |= val_mask[n_element]
+                N_val = _bit_count(sub_mask)
+                if N_val < N_sub:
+                    return -1 # Not enough values for the elements
+                if N_val > N_sub:
+                    continue
+
+                # Elimination
+                N_elim_unit = 0
+                for n_element in open_list:
+                    if (val_mask[n_element] & sub_mask == 0) or (n_element in n_element_tuple):
+                        continue
+                    N_cur = self._eliminate(n_element,sub_mask)
+                    if N_cur < 0:
+                        return -1
+                    N_elim_unit += N_cur
+                if N_elim_unit > 0:
+                    N_elim += N_elim_unit
+                    break # Next unit
+        return N_elim
+
+    def _hidden_subset(self,N_sub):
+        ## N_sub values in a unit confined to N_sub elements in total
+        # - Remove other values from these elements
+        val_mask = self.val_mask
+        N_elim = 0
+        for unit in self.unit_list:
+            open_list = [n_element for n_element in unit if self.is_placed[n_element] == False]
+            if len(open_list) <= N_sub:
+                continue
+
+            # Values found 2 to N_sub times, by bit-sliced counters
+            # - count_mask[n]: values found more than n times
+            count_mask = [0]*(N_sub+1)
+            for n_element in open_list:
+                cur_mask = val_mask[n_element]
+                for n_count in range(N_sub,0,-1):
+                    count_mask[n_count] |= count_mask[n_count-1] & cur_mask
+                count_mask[0] |= cur_mask
+            sel_mask = count_mask[1] & ~count_mask[N_sub]
+            if _bit_count(sel_mask) < N_sub:
+                continue
+
+            # Position mask of selected values in open_list
+            pos_mask = {}
+            for n_pos, n_element in enumerate(open_list):
+                cur_mask = val_mask[n_element] & sel_mask
+                while cur_mask:
+                    bit = cur_mask & -cur_mask
+                    cur_mask ^= bit
+                    pos_mask[bit] = pos_mask.get(bit,0) | (1 << n_pos)
+            sel_list = list(pos_mask)
+            for bit_tuple in itertools.combinations(sel_list,N_sub):
+                sub_mask = 0
+                sub_pos = 0
+                for bit in bit_tuple:
+                    sub_mask |= bit
+                    sub_pos |= pos_mask[bit]
+                N_pos = _bit_count(sub_pos)
+                if N_pos < N_sub:
+                    return -1 # Not enough elements for the values
+                if N_pos > N_sub:
+                    continue
+
+                # Elimination
+                N_elim_unit = 0
+                for n_pos, n_element in enumerate(open_list):
+                    if (sub_pos >> n_pos & 1) and (val_mask[n_element] & ~sub_mask):
+                        N_cur = self._eliminate(n_element,~sub_mask)
+                        if N_cur < 0:
+                            return -1
+                        N_elim_unit += N_cur
+                if N_elim_unit > 0:
+                    N_elim += N_elim_unit
+                    break # Next unit
+        return N_elim
 
-        # Status flag
-        B.is_valid = np.copy(A.is_valid)
-        B.is_solved = np.copy(A.is_solved)
-        B.val_list = np.copy(A.val_list)
-
-    def _scan(self):
-        # Min-max validity check
-        if np.max(self.cur_mat) <= 9 and np.min(self.cur_mat) >= 0:
-            # Flag initialization
-            is_changed = False
-            
-            # Scan for each element
-            for n_element in range(self.N_element):
-                # Current coordinate
-                n_row = int(n_element/self.N_size)
-                n_col = np.remainder(n_element,self.N_size)
-                cur_val = self.cur_mat[n_row,n_col]
-                cur_val_list = self.val_list[n_element]
-                
-                n_block1 = int(n_row/self.N_block)
-                n_block2 = int(n_col/self.N_block)
-                
-                # Pre-existing numbers
-                n_row0 = n_block1*self.N_block
-                n_col0 = n_block2*self.N_block
-                n_rowE = n_row0 + self.N_block
-                n_colE = n_col0 + self.N_block
-                cur_block_list = self.cur_mat[n_row0:n_rowE,n_col0:n_colE].flatten()
-                cur_row_list = self.cur_mat[n_row,:].flatten()
-                cur_col_list = self.cur_mat[:,n_col].flatten()
-                cur_pre_list = np.concatenate((cur_block_list,
-                                               cur_row_list,
-                                               cur_col_list))
-                cur_pre_uniq = np.unique(cur_pre_list)
-                
-                # Validity
-                if cur_val == 0:
-                    # Update validity list
-                    cur_val_list = np.setdiff1d(cur_val_list, cur_pre_uniq, assume_unique=True)
-                    
-                    if np.size(cur_val_list) != np.size(self.val_list[n_element]):
-                        self.val_list[n_element] = cur_val_list
-
-                        # Fill in matrix
-                        if np.size(cur_val_list) == 1:
-                            self.cur_mat[n_row,n_col] = cur_val_list[0]
-                            is_changed = True
-                        
-                        # No more valid list
-                        elif np.size(cur_val_list) == 0:
-                            self.is_valid = False
-                            break
-                else:
-                    i_block_match = cur_block_list == cur_val
-                    i_row_match = cur_row_list == cur_val
-                    i_col_match = cur_col_list == cur_val
-                    if ((np.size(cur_block_list[i_block_match]) != 1) or
-                       (np.size(cur_row_list[i_row_match]) != 1) or
-                       (np.size(cur_col_list[i_col_match]) != 1)):
-                        # Duplicate detected
-                        self.is_valid = False
-                        is_changed = False
-                        break                
-        else:
-            self.is_valid = False
-            is_changed = True
-
-        # Solution status
-        # - Check the count of zero is zero
-        # - And matrix must be valid
-        zero_count = np.size(self.cur_mat[self.cur_mat==0])
-        self.is_solved = (zero_count == 0) and self.is_valid
-
-        # End
-        return is_changed
-    
     def _sort_val_list_size(self):
         # Sorted list of element position
-        # based on size of val_list
+        # based on number of valid values
 
-        # Array of val_list size
-        val_list_size = np.zeros(self.N_element)
-        for n_element in range(self.N_element):
-            val_list_size[n_element] = np.size(self.val_list[n_element])
+        # Array of val_mask size
+        val_list_size = [_bit_count(cur_mask) for cur_mask in self.val_mask]
 
         # Sorted list
-        n_element_list = np.argsort(val_list_size)
+        n_element_list = sorted(range(self.N_element),key=val_list_size.__getitem__)
         return n_element_list
 
-    def _replaced_game(self,n_element,val):
-        n_row = int(n_element/self.N_size)
-        n_col = np.remainder(n_element,self.N_size)
-        
-        R = Sudoku(self.cur_mat)
-        R.cur_mat[n_row,n_col] = val
-        R.N_guess_layer = self.N_guess_layer + 1
-        R.N_trial = self.N_trial + 1
-        
-        return R
-        
+    def _mrv_element(self):
+        # Open element with fewest valid values, -1 if all placed
+        # - Ties go to the lowest element, not to set order, which depends on
+        #   search history and would make the branch element differ between runs
+        for size_bucket in self.size_bucket[1:]:
+            if size_bucket:
+                return min(size_bucket)
+        return -1
+
+    def _order_values(self,n_element):
+        ## Values of n_element, least constraining first
+        # - Count open peers that would lose each value
+        # - Value taken from fewer peers leaves more room for the rest
+        val_mask = self.val_mask
+        peer_list = self.peer_list[n_element]
+        val_list = _mask2list(val_mask[n_element])
+        N_constraint = {val: sum(1 for n_peer in peer_list if val_mask[n_peer] & (1 << (val-1)))
+                        for val in val_list}
+        return sorted(val_list,key=N_constraint.__getitem__)
+
+    @_search_phase
     def solve(self,n_guess_layer_max,n_trial_max,is_quiet=False):
+        self._solve(n_guess_layer_max,n_trial_max,is_quiet)
+
+    def _solve(self,n_guess_layer_max,n_trial_max,is_quiet,is_restored=False):
         ## Recurvise solver
-        # This method has critical issue to duplicate survey
+        # - Guess is made in place and undone by the trail on failure,
+        #   so no game is copied per guess
+        # - Branch only on element with fewest values (MRV),
+        #   values in least constraining order
+        # - Each open element is guessed at most once per path,
+        #   failure of all its values means the node is dead
+        # - Return True if the board is proven dead, which is recorded in
+        #   dead_table and skipped on later visits, e.g. next guess layer limit
+        # - is_restored: board restored by solve_deepening, whose eliminations
+        #   are not in board_hash until propagated, so its entry hash is not used
 
         # Guess layer \t
         tStr = ""
@@ -166,186 +743,399 @@ class Sudoku():
             tStr += "."
         
         # Scan update until there is nothing more to change
+        hash_list = []
+        if is_restored == False:
+            hash_list.append(self.board_hash)
+            if self._is_dead(self.board_hash):
+                self.is_valid = False
+                return True
         self._scan_till_end()
+        if self.is_valid == False:
+            self._add_dead(hash_list)
+            return True
+        if (len(hash_list) == 0) or (self.board_hash != hash_list[0]):
+            hash_list.append(self.board_hash)
+            if self._is_dead(self.board_hash):
+                self.is_valid = False
+                return True
         
         # Drill down if valid but not solved
         # - This will be called recursively
         if ((self.N_guess_layer < n_guess_layer_max) and  # Guess Layer
             (self.is_valid == True) and # Validity
             (self.is_solved == False)): # Solved status
-            for n_element_fill in self._sort_val_list_size():
-                if np.size(self.val_list[n_element_fill]) == 1:
-                    continue
+            n_element_fill = self._mrv_element()
+            is_all_dead = True
+            for val in self._order_values(n_element_fill):
+                # Trial limit check
+                if self.N_trial % 100 == 0:
+                    if is_quiet == False:
+                        print(tStr + "Current trial: " + str(self.N_trial))
+                if self.N_trial  > n_trial_max:
+                    #print(tStr + "Exceeded trial limit")
+                    return False
+                
+                # Guess and drill down
+                n_trail = len(self.trail)
+                self.N_trial += 1
+                self.N_guess_layer += 1
+                if self.metrics is not None:
+                    self.metrics.on_node(self)
+                is_dead = True
+                if self._place(n_element_fill,val) == True:
+                    is_dead = self._solve(n_guess_layer_max,n_trial_max,is_quiet)
                 else:
-                    val_list_fill = self.val_list[n_element_fill]
-                    for val in val_list_fill:
-                        # Trial limit check
-                        if np.remainder(self.N_trial,100)==0:
-                            if is_quiet == False:
-                                print(tStr + "Current trial: " + str(self.N_trial))
-                        if self.N_trial  > n_trial_max:
-                            #print(tStr + "Exceeded trial limit")
-                            return
-                        
-                        #n_row_fill = int(n_element_fill/self.N_size)
-                        #n_col_fill = np.remainder(n_element_fill,self.N_size)
-                        #print(tStr + "Guess: (" + str(n_row_fill) + ", " + str(n_col_fill) + ") = " + str(val))
-                        R = self._replaced_game(n_element_fill,val)
-                        R.solve(n_guess_layer_max,n_trial_max,is_quiet)
-                        self.N_trial = R.N_trial
-                        if R.is_valid == False:
-                            continue           
-                        if R.is_solved == True:
-                            self._copy_A2B(R,self)
-                            if R.N_layer_solved != 0:
-                                # Roll upstream
-                                self.N_layer_solved = R.N_layer_solved
-                            else: # First encounter
-                                self.N_layer_solved = R.N_guess_layer
-                            if is_quiet == False:
-                                print(tStr + "Found solution at trial " + str(self.N_trial))
-                            break
-                    #if self.N_trial  > n_trial_max:
-                    #    print(tStr + "Exceeded trial limit")
-                    #    return
-                if (self.is_solved == True):
+                    self.is_valid = False
+                self.N_guess_layer -= 1
+                if self.is_solved == True:
+                    if self.N_layer_solved == 0: # First encounter
+                        self.N_layer_solved = self.N_guess_layer + 1
+                        if self.metrics is not None:
+                            self.metrics.on_solution(self)
+                    if is_quiet == False:
+                        print(tStr + "Found solution at trial " + str(self.N_trial))
+                    return False
+
+                # Undo guess
+                self._rollback(n_trail)
+                self.is_valid = True
+                if self.metrics is not None:
+                    self.metrics.on_backtrack(self)
+                is_all_dead = is_all_dead and is_dead # Not surveyed to the end, e.g. guess layer limit
+            
+            # All values failed
+            if is_all_dead:
+                self._add_dead(hash_list)
+            return is_all_dead
+
+        # Keep board cut by guess layer limit for next deepening level
+        if ((self._frontier_list is not None) and
+            (self.is_valid == True) and
+            (self.is_solved == False)):
+            self._frontier_list.append((self.N_guess_layer,self._mask_diff()))
+        return False
+
+    @_search_phase
+    def solve_deepening(self,n_guess_layer_list,n_trial_max,is_quiet=False):
+        ## Iterative deepening over guess layer limits
+        # - Same result as calling solve for each limit in turn, without redoing
+        #   shallower levels
+        # - Root is propagated once
+        # - Boards cut by the previous limit are kept as the frontier, each as
+        #   its propagated candidate sets relative to the root, and the next
+        #   level searches from them only
+        # - Dead branches never enter the frontier, so they are not revisited
+        # - n_trial_max applies to each level as in solve
+        # - Board is left solved, or back at the root if not solved
+        self._scan_till_end()
+        if (self.is_valid == False) or (self.is_solved == True):
+            return
+        self._root_mask = list(self.val_mask)
+        n_trail_root = len(self.trail)
+        frontier_list = [(0,[])] # (guess layer, candidate sets changed from root)
+        for n_guess_layer_max in n_guess_layer_list:
+            N_trial_end = self.N_trial + n_trial_max
+            self._frontier_list = []
+            for n_node, (N_layer, mask_diff) in enumerate(frontier_list):
+                if N_layer >= n_guess_layer_max:
+                    self._frontier_list.append((N_layer,mask_diff)) # Not deep enough yet
+                    continue
+                if self.N_trial > N_trial_end:
+                    self._frontier_list.extend(frontier_list[n_node:]) # Left for next level
                     break
 
+                # Resume search from frontier board
+                N_frontier = len(self._frontier_list)
+                self.N_guess_layer = N_layer
+                if self._restore_diff(mask_diff) == True:
+                    self._solve(n_guess_layer_max,N_trial_end,is_quiet,is_restored=True)
+                self.N_guess_layer = 0
+                if self.is_solved == True:
+                    self._frontier_list = None
+                    if is_quiet == False:
+                        print("Found solution at guess layer limit " + str(n_guess_layer_max))
+                    return
+                if self.N_trial > N_trial_end:
+                    # Cut by trial limit, search this board again on next level
+                    del self._frontier_list[N_frontier:]
+                    self._frontier_list.append((N_layer,mask_diff))
+                self._rollback(n_trail_root)
+                self.is_valid = True
+            frontier_list = self._frontier_list
+            self._frontier_list = None
+            if len(frontier_list) == 0:
+                self.is_valid = False # Every branch is dead
+                break
+            if is_quiet == False:
+                print("Guess layer limit " + str(n_guess_layer_max) + ": " +
+                      str(len(frontier_list)) + " boards left")
+        self.is_solved = False
+        if is_quiet == False:
+            print("Ended survey without solving")
+
+    def _mask_diff(self):
+        # Candidate sets changed from root of solve_deepening
+        val_mask = self.val_mask
+        root_mask = self._root_mask
+        return [(n_element, val_mask[n_element]) for n_element in range(self.N_element)
+                if val_mask[n_element] != root_mask[n_element]]
+
+    def _restore_diff(self,mask_diff):
+        # Reduce candidate sets to a frontier board, placed by propagation of _solve
+        for n_element, cur_mask in mask_diff:
+            if self._eliminate(n_element,~cur_mask) < 0:
+                self.is_valid = False
+                return False
+        return True
+
+    def _is_dead(self,board_hash):
+        # Board recorded as dead
+        return (self.dead_table is not None) and (board_hash in self.dead_table)
+
+    def _add_dead(self,hash_list):
+        # Record boards proven dead
+        if self.dead_table is not None:
+            for board_hash in hash_list:
+                self.dead_table.add(board_hash)
+
+    @_search_phase
+    def count_solutions(self,limit=2,rng=None):
+        ## Count solutions up to limit
+        # - Complete search on the same board, branching on the element
+        #   with the fewest values
+        # - Stop as soon as limit solutions are found
+        # - Values are tried in random order if rng is given
+        # - Board is restored afterwards, first solution is kept in sol_mat
+        # - Queue, N_trial and N_layer_solved are restored too, so a later solve
+        #   sees the game as before, search nodes are kept in N_trial_count
+        n_trail = len(self.trail)
+        queue_save = list(self.queue) # Rollback clears queue
+        N_trial = self.N_trial
+        N_layer_solved = self.N_layer_solved
+        is_valid = self.is_valid
+        self.sol_mat = None
+        N_solution = 0
+        if self.is_valid == True:
+            N_solution = self._count_solutions(limit,rng)
+        self._rollback(n_trail)
+        self.queue.extend(queue_save)
+        self.N_trial_count = self.N_trial - N_trial
+        self.N_trial = N_trial
+        self.N_layer_solved = N_layer_solved
+        self.is_valid = is_valid
+        self.is_solved = (self.N_placed == self.N_element) and self.is_valid
+        return N_solution
+
+    def _count_solutions(self,limit,rng):
+        # Propagate and drill down
+        # - Boards without solution are recorded in dead_table
+        hash_list = [self.board_hash]
+        if self._is_dead(hash_list[0]):
+            return 0
+        if self._propagate() == False:
+            self._add_dead(hash_list)
+            return 0
+        if self.board_hash != hash_list[0]:
+            hash_list.append(self.board_hash)
+            if self._is_dead(self.board_hash):
+                return 0
+        if self.N_placed == self.N_element:
+            if self.sol_mat is None:
+                self.sol_mat = np.copy(self.cur_mat)
+                self.N_layer_solved = self.N_guess_layer
+            if self.metrics is not None:
+                self.metrics.on_solution(self)
+            return 1
+
+        # Element with the fewest values
+        n_element_fill = self._mrv_element()
+
+        # Try each value, least constraining first unless randomized
+        N_solution = 0
+        if rng is not None:
+            val_list_fill = _mask2list(self.val_mask[n_element_fill])
+            rng.shuffle(val_list_fill)
+        else:
+            val_list_fill = self._order_values(n_element_fill)
+        for val in val_list_fill:
+            n_trail = len(self.trail)
+            self.N_trial += 1
+            self.N_guess_layer += 1
+            if self.metrics is not None:
+                self.metrics.on_node(self)
+            if self._place(n_element_fill,val) == True:
+                N_solution += self._count_solutions(limit - N_solution,rng)
+            self.N_guess_layer -= 1
+            self._rollback(n_trail)
+            if N_solution >= limit:
+                break
+            if self.metrics is not None:
+                self.metrics.on_backtrack(self)
+        if N_solution == 0:
+            self._add_dead(hash_list)
+        return N_solution
+
     def _scan_till_end(self):
-        # Call scan until change stops or invalidated
-        is_changed = self._scan()
-        while (self.is_valid == True) and (is_changed == True):
-            is_changed = self._scan()
+        # Propagate queued changes until nothing more to change or invalidated
+        if self.is_valid == True:
+            self.is_valid = self._propagate()
+        self.is_solved = (self.N_placed == self.N_element) and self.is_valid
 
     def _extract_candidates(self,N_extract):
         ## Extract combination of element
         # - In order of val_list size
-        # - Using itertools.combinations(p,q)
-        # - Outputs list of tuples of selected n_element
-
-        # Array of val_list size
-        val_list_size = np.zeros(self.N_element)
-        for n_element in range(self.N_element):
-            val_list_size[n_element] = np.size(self.val_list[n_element])
+        # - Lazy itertools.combinations(p,q), tuples are made one at a time
+        #   so memory does not grow with the number of combinations
+        # - Outputs iterator of tuples of selected n_element
 
-        # Sorted list
-        val_list_size_sorted = np.sort(val_list_size)
-        n_element_list_sorted = np.argsort(val_list_size)
+        # Sorted list of element position
+        n_element_list_sorted = self._sort_val_list_size()
 
         # Ignore single size (determined) elements
-        i_unity = val_list_size_sorted == 1
-        n_element_list_sel = n_element_list_sorted[np.invert(i_unity)]
+        n_element_list_sel = [n_element for n_element in n_element_list_sorted
+                              if _bit_count(self.val_mask[n_element]) > 1]
 
-        # Return combinatoric output in list of tuples
-        return list(itertools.combinations(n_element_list_sel,N_extract))
+        # Return combinatoric output as iterator of tuples
+        return itertools.combinations(n_element_list_sel,N_extract)
 
+    @_search_phase
     def solve_comb(self,N_guess,n_trial_max,is_quiet=False):
         ## Combinatoric solver
         # - Survey of combinatoric candidate lists for a given guess layer
+        # - Values of each tuple are assigned depth first, see _solve_tuple
         # - Cutoff once trial_max is reached
         
         # Scan update until there is nothing more to change
         self._scan_till_end()
 
         # Exit if done
-        # Save current case for iteration
         if ((self.is_valid == False) or # Invalid or
             (self.is_solved == True)): # Solved
             return
-        else:
-            init_game = Sudoku(self.cur_mat)
 
         ## Start to guess if valid but not solved
-        # Candidate pairs
-        #n_element_tuple_list = self._extract_candidates(N_guess)
-        #N_tuple = len(n_element_tuple_list)
-        #for n_tuple in range(N_tuple):
-        #    n_element_tuple = n_element_tuple_list[n_tuple]
-        for n_element_tuple in self._extract_candidates(N_guess):        
-            # Iteration size
-            N_iter = 1
-            val_list_size = np.zeros(N_guess,dtype=int)
-            for n_guess in range(N_guess):
-                val_list_size[n_guess] = np.size(self.val_list[n_element_tuple[n_guess]])
-                N_iter *= val_list_size[n_guess]
-
-            # Iteration
-            for n_iter in range(N_iter):
-                # Update trial count
-                self.N_trial +=  1
-
-                # Index position
-                if n_iter == 0:
-                    index_pos = np.zeros(N_guess,dtype=int)
-                else:
-                    # Click-up
-                    index_pos[0] += 1
-
-                    # Carry
-                    for n_guess in range(N_guess):
-                        if index_pos[n_guess] >= val_list_size[n_guess]:
-                            index_pos[n_guess] = 0
-                            if n_guess < N_guess-1:
-                                index_pos[n_guess+1] += 1
-                
-                # Matrix update
-                for n_guess in range(N_guess):
-                    n_element = n_element_tuple[n_guess]
-                    n_row = int(n_element/self.N_size)
-                    n_col = np.remainder(n_element,self.N_size)
-                    val = self.val_list[n_element][index_pos[n_guess]]
-                    self.cur_mat[n_row,n_col] = val
-                #print(str(n_element_tuple) + " " + str(index_pos))
-                
-                # Scan till end
+        for n_element_tuple in self._extract_candidates(N_guess):
+            if self._solve_tuple(n_element_tuple,0,n_trial_max,is_quiet) == True:
+                return # Solved or exceeded trial limit
+        
+        if is_quiet == False:
+            print("Ended survey without solving")
+
+    def _solve_tuple(self,n_element_tuple,n_guess,n_trial_max,is_quiet):
+        ## Depth first value assignment to elements of a tuple
+        # - Partial assignment is dropped with all its extensions as soon as
+        #   a value is already used in a shared unit or empties a peer
+        # - Later elements only see values left by earlier guesses
+        # - Full assignment is propagated as one trial
+        # - Return True to stop the survey: solved or trial limit exceeded
+        if n_guess == len(n_element_tuple):
+            # Update trial count and scan till end
+            # - Skip boards recorded as dead, record new ones
+            self.N_trial += 1
+            hash_list = [self.board_hash]
+            if self._is_dead(hash_list[0]):
+                self.is_valid = False
+            else:
                 self._scan_till_end()
+                if self.is_valid == False:
+                    self._add_dead(hash_list)
+            if self.is_solved == True:
+                if self.metrics is not None:
+                    self.metrics.on_solution(self)
+                return True
 
-                # Exit if solved
-                # Reset if not
-                if self.is_solved == True:
-                    return
-                else:
-                    self._copy_A2B(init_game,self)
+            # Trial limit check
+            if self.N_trial % 100 == 0:
+                if is_quiet == False:
+                    print("Current trial: " + str(self.N_trial))
+            return self.N_trial > n_trial_max
 
-                # Trial limit check
-                if np.remainder(self.N_trial,100)==0:
-                    if is_quiet == False:
-                        print("Current trial: " + str(self.N_trial))
-                if self.N_trial > n_trial_max:
-                    #print(tStr + "Exceeded trial limit")
-                    return
-        
-        print("Ended survey without solving")
+        # Guess each value left at this element
+        n_element = n_element_tuple[n_guess]
+        n_trail = len(self.trail)
+        queue_save = list(self.queue) # Kept for next value, rollback clears queue
+        for val in _mask2list(self.val_mask[n_element]):
+            self.N_guess_layer += 1
+            if self.metrics is not None:
+                self.metrics.on_node(self)
+            is_stop = False
+            if self._place(n_element,val) == True:
+                is_stop = self._solve_tuple(n_element_tuple,n_guess+1,n_trial_max,is_quiet)
+            self.N_guess_layer -= 1
+            if self.is_solved == True:
+                return True
+
+            # Undo guess
+            self._rollback(n_trail)
+            self.queue.extend(queue_save)
+            self.is_valid = True
+            if self.metrics is not None:
+                self.metrics.on_backtrack(self)
+            if is_stop == True:
+                return True
+        return False
+
+    @_search_phase
+    def solve_dlx(self,n_trial_max=None,is_quiet=False):
+        ## Exact cover solver with Dancing Links
+        # - Alternative engine to solve and solve_comb
+        # - Deterministic and complete: fails only if no solution exists
+        #   or n_trial_max search nodes are exceeded
+        # - N_trial is count of search nodes
+        if self.is_valid == False:
+            return
+
+        # Search
+        dlx = build_sudoku_cover(self.val_mask,self.N_block)
+        solution_list = dlx.search(1,n_trial_max)
+        self.N_trial += dlx.N_node
+        if self.metrics is not None:
+            self.metrics.N_node += dlx.N_node
+            if len(solution_list) > 0:
+                self.metrics.on_solution(self)
+        if len(solution_list) == 0:
+            if dlx.is_aborted == False:
+                self.is_valid = False # No solution
+            if is_quiet == False:
+                print("Ended survey without solving")
+            return
+
+        # Fill in matrix
+        for row_id in solution_list[0]:
+            n_element, n_val = divmod(row_id,self.N_size)
+            if self.is_placed[n_element] == False:
+                self._place(n_element,n_val+1)
+        del self.queue[:]
+        self.N_layer_solved = dlx.N_layer_solved
+        self.is_solved = (self.N_placed == self.N_element) and self.is_valid
+        if is_quiet == False:
+            print("Found solution at trial " + str(self.N_trial))
 
     def display(self):
+        # Width of each value, e.g. 2 for 16x16
+        N_width = len(str(self.N_size))
+        N_line = (N_width+1)*self.N_size + 2*self.N_block - 2
+
         # Upper line
-        cur_str = ''
-        for n_col in range(2*self.N_size+2*self.N_block-2):
-            cur_str += '='
-        print(cur_str)
+        print('='*N_line)
 
-        # Main matrix
+        # Main matrix, row units of index table
         for n_row in range(self.N_size):
             cur_str = ''
-            for n_col in range(self.N_size):
-                cur_val = self.cur_mat[n_row,n_col]
+            for n_element in self.unit_list[n_row]:
+                cur_val = self.cur_vect[n_element]
                 if cur_val == 0:
-                    cur_str += '  '
+                    cur_str += ' '*(N_width+1)
                 else:
-                    cur_str += str(cur_val) + ' '
+                    cur_str += str(cur_val).rjust(N_width) + ' '
                 
-                if (np.remainder(n_col+1,self.N_block) == 0) and (n_col+1 < self.N_size):
+                n_col = self.col_of[n_element]
+                if ((n_col+1) % self.N_block == 0) and (n_col+1 < self.N_size):
                     cur_str += '| '
             print(cur_str)
 
-            if (np.remainder(n_row+1,self.N_block) == 0) and (n_row+1 < self.N_size):
-                cur_str = ''
-                for n_col in range(2*self.N_size+2*self.N_block-2):
-                    cur_str += '-'
-                print(cur_str)
+            if ((n_row+1) % self.N_block == 0) and (n_row+1 < self.N_size):
+                print('-'*N_line)
 
         # Lower line
-        cur_str = ''
-        for n_col in range(2*self.N_size+2*self.N_block-2):
-            cur_str += '='
-        print(cur_str)
\ No newline at end of file
+        print('='*N_line)